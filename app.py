@@ -1,16 +1,24 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file
+from flask import (Flask, render_template, stream_template, request, redirect, url_for, flash,
+                   get_flashed_messages, jsonify, abort, session,
+                   Response, stream_with_context)
+from jinja2 import FileSystemBytecodeCache
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from datetime import datetime, timedelta
+from werkzeug.utils import secure_filename
+from datetime import datetime, date
 import csv
+import logging
 import io
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
 from config import Config
-import math
+import time
+import functools
+import hashlib
+import itertools
+import re
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from firebase_admin import auth as firebase_auth
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 # Firebase imports
 from firebase_models import (
@@ -19,12 +27,33 @@ from firebase_models import (
     FirebaseAttendance,
     FirebaseTimesheet,
     FirebaseWFHApproval,
+    request_cached,
 )
 from firebase_service import get_firebase_service
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+logger = logging.getLogger(__name__)
+
+# Log to stderr at INFO; this app's own modules add DEBUG detail in development
+# only, unless LOG_LEVEL overrides it
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+_app_log_level = (app.config.get('LOG_LEVEL') or ('DEBUG' if app.debug else 'INFO')).upper()
+for _logger_name in (__name__, 'firebase_service', 'firebase_models'):
+    logging.getLogger(_logger_name).setLevel(_app_log_level)
+
+if not app.debug:
+    # Templates do not change while a release is running: skip the per-render
+    # mtime check and reuse compiled template bytecode across worker restarts
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    app.jinja_env.auto_reload = False
+    try:
+        os.makedirs(Config.JINJA_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(Config.JINJA_CACHE_DIR)
+    except OSError as e:
+        logger.warning("Jinja bytecode cache disabled: %s", e)
+
 # Flask-Login setup
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -44,48 +73,261 @@ except Exception as e:
 @login_manager.user_loader
 def load_user(user_id):
     """Load user for Flask-Login"""
-    if user_id.startswith("admin-"):
-        doc_id = user_id.split("-")[1]
-        return FirebaseAdmin.find_by_doc_id(doc_id)
-    elif user_id.startswith("employee-"):
-        doc_id = user_id.split("-")[1]
-        return FirebaseEmployee.find_by_doc_id(doc_id)
-    return None
+    # One scan for the prefix; document IDs containing '-' stay intact.
+    # Runs on every request, so the user document comes from a short-lived cache.
+    prefix, _, doc_id = user_id.partition('-')
+    finder = _USER_FINDERS.get(prefix)
+    return finder(doc_id, cached=True) if finder else None
+
+# get_id() prefix -> finder; the ids live in existing session cookies, so the
+# 'admin-'/'employee-' format is kept
+_USER_FINDERS = {
+    'admin': FirebaseAdmin.find_by_doc_id,
+    'employee': FirebaseEmployee.find_by_doc_id,
+}
+
+# Shared worker pool for issuing independent Firestore reads concurrently, so
+# a handler waits for the slowest round-trip instead of the sum of them all
+# (sized to match gunicorn's request threads per worker; see gunicorn_conf.py)
+_firestore_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('GUNICORN_THREADS', 32)),
+                                     thread_name_prefix='firestore')
+
+# Short-lived in-process cache for admin dashboard reads. Firestore round-trips
+# are the slow part of that page, and admins refresh it repeatedly.
+# Each gunicorn worker has its own copy, so keys include a change marker read
+# from Firestore (daily_stats updated_at, the newest timesheet submission):
+# a write handled by any worker changes the key everywhere.
+DASHBOARD_CACHE_TTL_SECONDS = 30
+_dashboard_cache = {}
+_dashboard_cache_lock = threading.Lock()
+
+def _dashboard_cached(key, loader):
+    """Return the cached value for key, calling loader() if missing or expired"""
+    now = time.monotonic()
+    with _dashboard_cache_lock:
+        entry = _dashboard_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+    value = loader()
+    with _dashboard_cache_lock:
+        # Drop expired entries (e.g. previous days) so the cache stays bounded
+        for stale_key in [k for k, (expires, _) in _dashboard_cache.items() if expires <= now]:
+            del _dashboard_cache[stale_key]
+        _dashboard_cache[key] = (now + DASHBOARD_CACHE_TTL_SECONDS, value)
+    return value
+
+def _attendance_marker(*dates):
+    """Change marker for attendance listings that every worker sees: the
+    daily_stats updated_at of the given days, which every attendance write bumps"""
+    return tuple(stats.get('updated_at') for stats in _firestore_pool.map(FirebaseAttendance.get_daily_stats, dates))
+
+def _invalidate_dashboard_cache(today):
+    """Forget cached dashboard reads after attendance writes
+    (employee writes clear the employees cache in firebase_models)"""
+    with _dashboard_cache_lock:
+        for key in [k for k in _dashboard_cache if isinstance(k, tuple) and k[:2] == ('att', today)]:
+            del _dashboard_cache[key]
+
+# WFH approvals are only ever added, so a "yes" for a date stays true and can be
+# reused for a while. A "no" is kept briefly, since another worker may record an
+# approval this process never hears about.
+WFH_APPROVED_TTL_SECONDS = 300
+WFH_NOT_APPROVED_TTL_SECONDS = 30
+WFH_CACHE_MAX_ENTRIES = 4096
+_wfh_approval_cache = {}
+_wfh_approval_cache_lock = threading.Lock()
+
+@request_cached
+def _is_wfh_approved(employee_id, today_str):
+    """FirebaseWFHApproval.is_approved_for_date behind a short cross-request cache"""
+    key = (employee_id, today_str)
+    now = time.monotonic()
+    with _wfh_approval_cache_lock:
+        entry = _wfh_approval_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+    approved = FirebaseWFHApproval.is_approved_for_date(employee_id, today_str)
+    ttl = WFH_APPROVED_TTL_SECONDS if approved else WFH_NOT_APPROVED_TTL_SECONDS
+    with _wfh_approval_cache_lock:
+        if len(_wfh_approval_cache) >= WFH_CACHE_MAX_ENTRIES:
+            _wfh_approval_cache.clear()
+        _wfh_approval_cache[key] = (now + ttl, approved)
+    return approved
+
+def _invalidate_wfh_cache():
+    with _wfh_approval_cache_lock:
+        _wfh_approval_cache.clear()
+
+def admin_required(view):
+    """Send anyone who is not a logged-in admin to the admin login page.
+    Goes below @login_required."""
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if not getattr(current_user, 'is_admin', False):
+            return redirect(url_for('admin_login'))
+        return view(*args, **kwargs)
+    return wrapped
+
+def employee_required(view=None, *, redirect_to='employee_portal'):
+    """Send anyone who is not a logged-in employee to redirect_to.
+    Goes below @login_required; use as @employee_required or
+    @employee_required(redirect_to='employee_login')."""
+    if view is None:
+        return functools.partial(employee_required, redirect_to=redirect_to)
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated or getattr(current_user, 'is_admin', False):
+            return redirect(url_for(redirect_to))
+        # The session user is cached per worker and can miss a deactivation
+        # handled by another one; before anything is written, confirm uncached
+        # that the employee still exists and is active
+        if request.method != 'GET':
+            employee = FirebaseEmployee.find_by_doc_id(current_user.id)
+            if not employee or not employee.is_active:
+                logout_user()
+                return _post_response('Employee is inactive. Contact admin.', 'error', 'employee_login')
+        return view(*args, **kwargs)
+    return wrapped
+
+def _wants_json():
+    """True when the client (XHR/API) asked for JSON rather than an HTML page"""
+    return request.accept_mimetypes.best == 'application/json'
+
+def _post_response(message, category, endpoint):
+    """Finish a POST action: flash + redirect for browsers, a small JSON body for
+    JSON clients so they skip the redirect and the follow-up template render"""
+    if _wants_json():
+        success = category == 'success'
+        return jsonify({'success': success, 'message': message,
+                        'redirect': url_for(endpoint)}), (200 if success else 400)
+    flash(message, category)
+    return redirect(url_for(endpoint))
+
+_ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def _parse_date_arg(value):
+    """Parse a YYYY-MM-DD query argument; None if missing or malformed"""
+    # Python 3.11+ fromisoformat also takes other ISO shapes; keep the strict one
+    if not value or not _ISO_DATE_RE.fullmatch(value):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+def _stream_page(template_name, **context):
+    """Render a listing page as a streamed response so rows reach the browser as
+    Jinja produces them instead of after the whole page is built"""
+    # Pop flashed messages now: the session cookie is written before a
+    # streamed body renders, so popping them mid-stream would not stick
+    get_flashed_messages()
+    return stream_template(template_name, **context)
+
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w.-]')
+
+# Rows per streamed CSV chunk: writerows() runs the per-row loop in C, and
+# fewer, larger chunks cut per-yield overhead while memory stays bounded
+CSV_STREAM_CHUNK_ROWS = 100
+
+def _stream_csv(rows, header, filename):
+    """Send rows as a CSV download, encoding CSV_STREAM_CHUNK_ROWS rows at a time
+    so memory stays flat however many rows the iterable yields"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def generate():
+        # BOM first so Excel opens the file as UTF-8
+        writer.writerow(header)
+        yield ('\ufeff' + buf.getvalue()).encode('utf-8')
+        buf.seek(0)
+        buf.truncate(0)
+        row_iter = iter(rows)
+        while True:
+            chunk = list(itertools.islice(row_iter, CSV_STREAM_CHUNK_ROWS))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate(0)
+
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename="{_UNSAFE_FILENAME_RE.sub("_", filename)}"'})
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+def _page_size_arg():
+    """Read ?page_size=, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+# Cursors of the earlier pages travel in repeated ?prev= args so a listing can
+# step back a page. Capped to keep URLs under gunicorn's request-line limit;
+# past the cap, stepping back reaches the newest page early.
+MAX_PREV_CURSORS = 50
+
+def _pagination_args(cursor):
+    """Template args for the pagination links: `previous` holds the url_for args
+    of the page before this one (None on the first page) and `next_prev` the
+    cursor stack to send with the Next link"""
+    prev_cursors = request.args.getlist('prev')[-MAX_PREV_CURSORS:]
+    if not cursor:
+        return {'previous': None, 'next_prev': []}
+    return {'previous': {'cursor': prev_cursors[-1] if prev_cursors else None, 'prev': prev_cursors[:-1]},
+            'next_prev': (prev_cursors + [cursor])[-MAX_PREV_CURSORS:]}
+
+# Employees nearly always sign in and out at the same office, so the session
+# remembers the last office that matched and it is tried before the full scan
+OFFICE_HINT_TTL_SECONDS = 600
+
+def _office_hint():
+    """Index of the office this session last matched, or None if unset or stale"""
+    index = session.get('last_office_idx')
+    if index is None or time.time() - session.get('last_office_ts', 0) > OFFICE_HINT_TTL_SECONDS:
+        return None
+    return index
+
+def _remember_office(index):
+    session['last_office_idx'] = index
+    session['last_office_ts'] = time.time()
 
 # Geofence functions (same as before)
-def haversine_distance_m(lat1, lon1, lat2, lon2):
-    R = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-def is_within_office_geofence(lat, lon):
+def is_within_office_geofence(lat, lon, hint_office_idx=None):
     if lat is None or lon is None:
-        print(f"DEBUG Geofence: Missing coordinates lat={lat}, lon={lon}")
+        logger.debug("Geofence: missing coordinates lat=%s lon=%s", lat, lon)
         return False
     try:
         user_lat = float(lat)
         user_lon = float(lon)
+
+        if hint_office_idx is not None:
+            office_name = Config.is_within_office_index(hint_office_idx, user_lat, user_lon)
+            if office_name:
+                _remember_office(hint_office_idx)
+                logger.debug("Geofence: user=(%s, %s) is within %s", user_lat, user_lon, office_name)
+                return True
         
-        # Use the new multi-location system
-        is_within, office_name = Config.is_within_office_location(user_lat, user_lon)
-        
+        # One (memoized) pass over all offices
+        office_name, office_idx = Config.check_office_location(user_lat, user_lon)
+        is_within = office_name is not None
+
         if is_within:
-            print(f"DEBUG Geofence: user=({user_lat}, {user_lon}) is within {office_name}")
-        else:
-            print(f"DEBUG Geofence: user=({user_lat}, {user_lon}) is not within any office location")
-            # Debug: show distances to all offices
-            for office in Config.OFFICE_LOCATIONS:
-                distance = haversine_distance_m(user_lat, user_lon, office['latitude'], office['longitude'])
-                print(f"  - Distance to {office['name']}: {distance:.2f}m (radius: {office['radius_meters']}m)")
-        
+            _remember_office(office_idx)
+            logger.debug("Geofence: user=(%s, %s) is within %s", user_lat, user_lon, office_name)
+        elif logger.isEnabledFor(logging.DEBUG):
+            # Distances are only worked out when someone is reading them
+            logger.debug("Geofence: user=(%s, %s) is not within any office location", user_lat, user_lon)
+            for office, distance in Config.office_distances_m(user_lat, user_lon):
+                logger.debug("  - Distance to %s: %.2fm (radius: %sm)",
+                             office['name'], distance, office['radius_meters'])
+
         return is_within
     except Exception as e:
-        print(f"DEBUG Geofence error: {e} with lat={lat} lon={lon}")
+        logger.warning("Geofence error: %s with lat=%s lon=%s", e, lat, lon)
         return False
 
 # Routes
@@ -99,27 +341,34 @@ def index():
 @app.route('/employee')
 def employee_portal():
     """Employee portal"""
-    return render_template('employee_portal.html', 
-                         office_locations=Config.OFFICE_LOCATIONS,
-                         office_lat=Config.OFFICE_LATITUDE, 
-                         office_lng=Config.OFFICE_LONGITUDE, 
-                         office_radius=Config.OFFICE_RADIUS_METERS)
+    return render_template('employee_portal.html')
 
 @app.route('/employee/login', methods=['GET'])
 def employee_login():
     """Employee login functionality"""
-    return render_template('employee_login.html', 
-                         office_locations=Config.OFFICE_LOCATIONS,
-                         office_lat=Config.OFFICE_LATITUDE, 
-                         office_lng=Config.OFFICE_LONGITUDE, 
-                         office_radius=Config.OFFICE_RADIUS_METERS)
+    return render_template('employee_login.html')
+
+# Sign-in outcome by (admin approved WFH, employee ticked WFH):
+# (work_from_home, None or (confirm_message, flash_message) if confirmation is needed)
+_WFH_SIGNIN_MATRIX = {
+    (True, True): (True, None),
+    # Admin approved but checkbox not checked
+    (True, False): (False, ("Admin has approved WFH, but you're signing in from office. Continue?",
+                            'Admin has approved WFH, but you did not check the WFH box. Please confirm you want to sign in from office.')),
+    # Checkbox checked but admin not approved
+    (False, True): (False, ("WFH is not approved. You're signing in from office. Continue?",
+                            'WFH not approved by admin for today. Please confirm you want to sign in from office.')),
+    (False, False): (False, None),
+}
 
 @app.route('/employee/signin', methods=['GET', 'POST'])
 @login_required
+@employee_required(redirect_to='employee_login')
 def employee_signin():
     """Employee sign-in functionality - requires login first"""
-    if not isinstance(current_user, FirebaseEmployee):
-        return redirect(url_for('employee_login'))
+    now = datetime.now()
+    today = now.date()
+    today_str = today.isoformat()
     
     if request.method == 'POST':
         employee_id = current_user.employee_id
@@ -128,57 +377,41 @@ def employee_signin():
         # Employee must check WFH box AND admin must have approved WFH
         work_from_home_checkbox = request.form.get('work_from_home') == '1'
         confirm_office = request.form.get('confirm_office') == '1'  # Confirmation flag
-        today_str = datetime.now().strftime('%Y-%m-%d')
-        admin_approved_wfh = FirebaseWFHApproval.is_approved_for_date(employee_id, today_str)
-        
-        # WFH only if: checkbox is checked AND admin approved
-        work_from_home = work_from_home_checkbox and admin_approved_wfh
-        
-        # Scenario 2: Admin approved but checkbox not checked - need confirmation
-        if admin_approved_wfh and not work_from_home_checkbox and not confirm_office:
-            flash('Admin has approved WFH, but you did not check the WFH box. Please confirm you want to sign in from office.', 'warning')
-            return render_template('employee_signin.html',
-                                 office_locations=Config.OFFICE_LOCATIONS,
-                                 office_lat=Config.OFFICE_LATITUDE,
-                                 office_lng=Config.OFFICE_LONGITUDE,
-                                 office_radius=Config.OFFICE_RADIUS_METERS,
-                                 admin_approved_wfh=admin_approved_wfh,
-                                 show_office_confirm=True,
-                                 confirm_message="Admin has approved WFH, but you're signing in from office. Continue?")
+        # Today's attendance is needed on the success path; read it while the WFH check runs
+        attendance_future = _firestore_pool.submit(FirebaseAttendance.find_by_employee_and_date, employee_id, today)
+        admin_approved_wfh = _is_wfh_approved(employee_id, today_str)
         
-        # Scenario 3: Checkbox checked but admin not approved - need confirmation
-        if work_from_home_checkbox and not admin_approved_wfh and not confirm_office:
-            flash('WFH not approved by admin for today. Please confirm you want to sign in from office.', 'warning')
+        # WFH only if: checkbox is checked AND admin approved; a mismatch
+        # between the two needs the employee to confirm an office sign-in
+        work_from_home, confirm = _WFH_SIGNIN_MATRIX[(admin_approved_wfh, work_from_home_checkbox)]
+        if confirm and not confirm_office:
+            confirm_message, flash_message = confirm
+            if _wants_json():
+                return jsonify({'success': False, 'confirm_required': True, 'message': confirm_message}), 409
+            flash(flash_message, 'warning')
             return render_template('employee_signin.html',
-                                 office_locations=Config.OFFICE_LOCATIONS,
-                                 office_lat=Config.OFFICE_LATITUDE,
-                                 office_lng=Config.OFFICE_LONGITUDE,
-                                 office_radius=Config.OFFICE_RADIUS_METERS,
                                  admin_approved_wfh=admin_approved_wfh,
                                  show_office_confirm=True,
-                                 confirm_message="WFH is not approved. You're signing in from office. Continue?")
-        print(f"DEBUG Route: /employee/signin POST lat={lat} lon={lon} work_from_home={work_from_home}")
+                                 confirm_message=confirm_message)
+        logger.debug("Sign-in POST lat=%s lon=%s work_from_home=%s", lat, lon, work_from_home)
         
         # Enforce geofence for sign-in - only if not working from home
         if not work_from_home:
             # Geofence check for office workers
-            if not is_within_office_geofence(lat, lon):
-                flash('Sign-in denied: You are not within any office location.', 'error')
-                return redirect(url_for('employee_dashboard'))
+            if not is_within_office_geofence(lat, lon, hint_office_idx=_office_hint()):
+                return _post_response('Sign-in denied: You are not within any office location.', 'error', 'employee_dashboard')
         
-        today = datetime.now().date()
-        existing_attendance = FirebaseAttendance.find_by_employee_and_date(employee_id, today)
+        existing_attendance = attendance_future.result()
         
         if existing_attendance and existing_attendance.sign_in_time:
-            flash('You have already signed in today!', 'error')
-            return redirect(url_for('employee_dashboard'))
+            return _post_response('You have already signed in today!', 'error', 'employee_dashboard')
         
         # Create new attendance record
         if not existing_attendance:
             attendance = FirebaseAttendance({
                 'employee_id': employee_id,
-                'date': today.strftime('%Y-%m-%d'),
-                'sign_in_time': datetime.now(),
+                'date': today_str,
+                'sign_in_time': now,
                 'sign_out_time': None,
                 'total_hours': None,
                 'work_location': 'home' if work_from_home else 'office',
@@ -186,94 +419,85 @@ def employee_signin():
             })
         else:
             attendance = existing_attendance
-            attendance.sign_in_time = datetime.now()
+            attendance.sign_in_time = now
             attendance.work_location = 'home' if work_from_home else 'office'
             attendance.wfh_approved = work_from_home
         
-        print(f"DEBUG: Attempting to save attendance for {employee_id} on {today}")
+        logger.debug("Attempting to save attendance for %s on %s", employee_id, today)
         if attendance.save():
-            print(f"DEBUG: Successfully saved attendance record")
-            flash(f'Welcome {current_user.name}! You have successfully signed in at {datetime.now().strftime("%H:%M:%S")}', 'success')
-        else:
-            print(f"DEBUG: Failed to save attendance record")
-            flash('Error recording sign-in. Please try again.', 'error')
+            _invalidate_dashboard_cache(today)
+            logger.debug("Successfully saved attendance record")
+            return _post_response(f'Welcome {current_user.name}! You have successfully signed in at {now.strftime("%H:%M:%S")}', 'success', 'employee_dashboard')
         
-        return redirect(url_for('employee_dashboard'))
+        logger.debug("Failed to save attendance record")
+        if not existing_attendance and FirebaseAttendance.find_by_employee_and_date(employee_id, today):
+            # Another sign-in for today created the record first
+            return _post_response('You have already signed in today!', 'error', 'employee_dashboard')
+        return _post_response('Error recording sign-in. Please try again.', 'error', 'employee_dashboard')
     
     # Check if admin has approved WFH for today
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    admin_approved_wfh = FirebaseWFHApproval.is_approved_for_date(current_user.employee_id, today_str)
+    admin_approved_wfh = _is_wfh_approved(current_user.employee_id, today_str)
     
     return render_template('employee_signin.html', 
-                         office_locations=Config.OFFICE_LOCATIONS,
-                         office_lat=Config.OFFICE_LATITUDE, 
-                         office_lng=Config.OFFICE_LONGITUDE, 
-                         office_radius=Config.OFFICE_RADIUS_METERS,
                          admin_approved_wfh=admin_approved_wfh)
 
 @app.route('/employee/signout', methods=['GET', 'POST'])
 @login_required
+@employee_required(redirect_to='employee_login')
 def employee_signout():
     """Employee sign-out functionality - requires login first"""
-    if not isinstance(current_user, FirebaseEmployee):
-        return redirect(url_for('employee_login'))
-    
     if request.method == 'GET':
-        return render_template(
-            'employee_signout.html',
-            office_locations=Config.OFFICE_LOCATIONS,
-            office_lat=Config.OFFICE_LATITUDE,
-            office_lng=Config.OFFICE_LONGITUDE,
-            office_radius=Config.OFFICE_RADIUS_METERS,
-        )
+        return render_template('employee_signout.html')
 
     # POST: perform geofence check and complete sign-out
     lat = request.form.get('latitude')
     lon = request.form.get('longitude')
-    print(f"DEBUG Route: /employee/signout POST lat={lat} lon={lon}")
+    logger.debug("Sign-out POST lat=%s lon=%s", lat, lon)
 
     employee_id = current_user.employee_id
-    today = datetime.now().date()
-    attendance = FirebaseAttendance.find_by_employee_and_date(employee_id, today)
+    now = datetime.now()
+    today = now.date()
+    today_str = today.isoformat()
+    # The attendance, WFH approval and timesheet reads are independent: issue them together
+    attendance_future = _firestore_pool.submit(FirebaseAttendance.find_by_employee_and_date, employee_id, today)
+    wfh_future = _firestore_pool.submit(_is_wfh_approved, employee_id, today_str)
+    timesheet_future = None
+    if Config.REQUIRE_TIMESHEET_FOR_SIGNOUT:
+        timesheet_future = _firestore_pool.submit(FirebaseTimesheet.find_by_employee_and_date, employee_id, today)
+    attendance = attendance_future.result()
     
     # Get work location from attendance record
-    today_str = today.strftime('%Y-%m-%d')
-    work_from_home = (attendance.work_location == 'home' if attendance else False) or (
-        FirebaseWFHApproval.is_approved_for_date(employee_id, today_str)
-    )
-    print(f"DEBUG: Work from home status: {work_from_home}")
+    work_from_home = (attendance.work_location == 'home' if attendance else False) or wfh_future.result()
+    logger.debug("Work from home status: %s", work_from_home)
     
     # Enforce geofence for sign-out - only if not working from home
     if not work_from_home:
         # Geofence check for office workers
-        if not is_within_office_geofence(lat, lon):
-            flash('Sign-out denied: You are not within any office location.', 'error')
-            return redirect(url_for('employee_dashboard'))
+        if not is_within_office_geofence(lat, lon, hint_office_idx=_office_hint()):
+            return _post_response('Sign-out denied: You are not within any office location.', 'error', 'employee_dashboard')
 
     if not attendance or not attendance.sign_in_time:
-        flash('You have not signed in today!', 'error')
-        return redirect(url_for('employee_dashboard'))
+        return _post_response('You have not signed in today!', 'error', 'employee_dashboard')
 
     if attendance.sign_out_time:
-        flash('You have already signed out today!', 'error')
-        return redirect(url_for('employee_dashboard'))
+        return _post_response('You have already signed out today!', 'error', 'employee_dashboard')
 
     # Check if timesheet is required for sign-out
-    if Config.REQUIRE_TIMESHEET_FOR_SIGNOUT:
-        existing_timesheet = FirebaseTimesheet.find_by_employee_and_date(employee_id, today)
+    if timesheet_future is not None:
+        existing_timesheet = timesheet_future.result()
         if not existing_timesheet:
+            if _wants_json():
+                return jsonify({'success': False, 'timesheet_required': True,
+                                'message': 'You must submit your daily timesheet before signing out.',
+                                'redirect': url_for('employee_timesheet')}), 409
             flash('You must submit your daily timesheet before signing out.', 'error')
             return render_template(
                 'employee_signout.html',
-                office_locations=Config.OFFICE_LOCATIONS,
-                office_lat=Config.OFFICE_LATITUDE,
-                office_lng=Config.OFFICE_LONGITUDE,
-                office_radius=Config.OFFICE_RADIUS_METERS,
                 show_timesheet_requirement=True
             )
 
     # Calculate working hours
-    sign_out_time = datetime.now()
+    sign_out_time = now
     attendance.sign_out_time = sign_out_time
 
     sign_in_datetime = attendance.get_sign_in_datetime()
@@ -286,32 +510,37 @@ def employee_signout():
         minutes = int((total_hours - hours) * 60)
 
         if attendance.save():
-            flash(f'Goodbye {current_user.name}! You have worked for {hours} hours and {minutes} minutes today.', 'success')
-        else:
-            flash('Error recording sign-out. Please try again.', 'error')
-    else:
-        flash('Error calculating working hours. Please contact admin.', 'error')
+            _invalidate_dashboard_cache(today)
+            return _post_response(f'Goodbye {current_user.name}! You have worked for {hours} hours and {minutes} minutes today.', 'success', 'employee_dashboard')
+        return _post_response('Error recording sign-out. Please try again.', 'error', 'employee_dashboard')
     
-    return redirect(url_for('employee_dashboard'))
+    return _post_response('Error calculating working hours. Please contact admin.', 'error', 'employee_dashboard')
 
 @app.route('/employee/dashboard')
 @login_required
+@employee_required
 def employee_dashboard():
     """Employee dashboard - shows personal attendance info"""
-    if not isinstance(current_user, FirebaseEmployee):
-        return redirect(url_for('employee_portal'))
-    
     # Get today's attendance for this employee
     today = datetime.now().date()
-    today_attendance = FirebaseAttendance.find_by_employee_and_date(current_user.employee_id, today)
-    print(f"DEBUG: Today attendance query for {current_user.employee_id} on {today}: {today_attendance.to_dict() if today_attendance else 'None'}")
+    # Fetch today's attendance and recent timesheets (last 10 days) concurrently
+    # Read fresh: this is the page a sign-in/out redirects to, possibly on another worker
+    attendance_future = _firestore_pool.submit(FirebaseAttendance.find_by_employee_and_date,
+                                               current_user.employee_id, today)
+    timesheets_future = _firestore_pool.submit(FirebaseTimesheet.get_by_employee, current_user.employee_id, 10)
+    today_attendance = attendance_future.result()
     
     # Get recent timesheets instead of recent attendance (last 10 days)
-    recent_timesheets = FirebaseTimesheet.get_by_employee(current_user.employee_id, limit=10)
-    print(f"DEBUG: Employee {current_user.employee_id} ({current_user.name}) has {len(recent_timesheets)} timesheet records")
+    recent_timesheets = timesheets_future.result()
     
-    for i, record in enumerate(recent_timesheets):
-        print(f"DEBUG: Timesheet Record {i}: {record.to_dict()}")
+    # Only pay for to_dict() when debug logging is actually on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Today attendance query for %s on %s: %s", current_user.employee_id, today,
+                     today_attendance.to_dict() if today_attendance else None)
+        logger.debug("Employee %s (%s) has %d timesheet records",
+                     current_user.employee_id, current_user.name, len(recent_timesheets))
+        for i, record in enumerate(recent_timesheets):
+            logger.debug("Timesheet Record %d: %s", i, record.to_dict())
     
     return render_template('employee_dashboard.html',
                          today_attendance=today_attendance,
@@ -320,65 +549,62 @@ def employee_dashboard():
 
 @app.route('/employee/attendance')
 @login_required
+@employee_required
 def employee_attendance():
     """Employee attendance records - read-only view"""
-    if not isinstance(current_user, FirebaseEmployee):
-        return redirect(url_for('employee_portal'))
-    
     # Get date filter
     date_filter = request.args.get('date')
-    print(f"DEBUG: Date filter received: {date_filter}")
+    logger.debug("Date filter received: %s", date_filter)
     
-    if date_filter:
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            print(f"DEBUG: Parsed filter date: {filter_date}")
-            attendance_records = [FirebaseAttendance.find_by_employee_and_date(current_user.employee_id, filter_date)]
-            attendance_records = [record for record in attendance_records if record is not None]
-            print(f"DEBUG: Found {len(attendance_records)} records for filtered date {filter_date}")
-            if len(attendance_records) == 0:
-                print(f"DEBUG: No attendance records found for {current_user.employee_id} on {filter_date}")
-        except ValueError as e:
-            print(f"DEBUG: Error parsing date filter: {e}")
-            attendance_records = FirebaseAttendance.get_by_employee(current_user.employee_id, limit=50)
+    filter_date = _parse_date_arg(date_filter)
+    if filter_date:
+        logger.debug("Parsed filter date: %s", filter_date)
+        attendance_records = [FirebaseAttendance.find_by_employee_and_date(current_user.employee_id, filter_date)]
+        attendance_records = [record for record in attendance_records if record is not None]
+        logger.debug("Found %d records for filtered date %s", len(attendance_records), filter_date)
     else:
-        print(f"DEBUG: No date filter, getting all records")
-        attendance_records = FirebaseAttendance.get_by_employee(current_user.employee_id, limit=50)
+        # No (or an unparseable) date filter
+        logger.debug("No date filter, getting all records")
+        attendance_records = FirebaseAttendance.get_by_employee(current_user.employee_id, limit=50,
+                                                                fields=FirebaseAttendance.LIST_FIELDS)
     
-    print(f"DEBUG: Employee attendance view - {current_user.employee_id} has {len(attendance_records)} total records")
+    logger.debug("Employee attendance view - %s has %d total records", current_user.employee_id, len(attendance_records))
     
-    # Calculate statistics
+    # Calculate statistics in a single pass over the records; at most 50 rows,
+    # so staging them into arrays would cost more than the loop itself
     total_days = len(attendance_records)
-    total_hours = sum([r.total_hours or 0 for r in attendance_records])
-    complete_days = len([r for r in attendance_records if r.sign_in_time and r.sign_out_time])
-    
-    # Calculate average hours per day
-    avg_hours_per_day = total_hours / total_days if total_days > 0 else 0
-    
-    # Calculate average sign-in and sign-out times
-    signin_times = []
-    signout_times = []
+    total_hours = 0
+    complete_days = 0
+    signin_minutes = signin_count = 0
+    signout_minutes = signout_count = 0
     
     for record in attendance_records:
+        total_hours += record.total_hours or 0
+        if record.sign_in_time and record.sign_out_time:
+            complete_days += 1
         signin_dt = record.get_sign_in_datetime()
         signout_dt = record.get_sign_out_datetime()
         if signin_dt:
-            signin_times.append(signin_dt)
+            signin_minutes += signin_dt.hour * 60 + signin_dt.minute
+            signin_count += 1
         if signout_dt:
-            signout_times.append(signout_dt)
+            signout_minutes += signout_dt.hour * 60 + signout_dt.minute
+            signout_count += 1
     
+    # Calculate average hours per day
+    avg_hours_per_day = total_hours / total_days if total_days > 0 else 0
+    
+    # Average sign-in and sign-out times (mean minutes since midnight)
     avg_signin_time = "09:00"  # Default
     avg_signout_time = "17:00"  # Default
     
-    if signin_times:
-        avg_hour = sum([t.hour for t in signin_times]) / len(signin_times)
-        avg_minute = sum([t.minute for t in signin_times]) / len(signin_times)
-        avg_signin_time = f"{int(avg_hour):02d}:{int(avg_minute):02d}"
+    if signin_count:
+        avg = signin_minutes // signin_count
+        avg_signin_time = f"{avg // 60:02d}:{avg % 60:02d}"
     
-    if signout_times:
-        avg_hour = sum([t.hour for t in signout_times]) / len(signout_times)
-        avg_minute = sum([t.minute for t in signout_times]) / len(signout_times)
-        avg_signout_time = f"{int(avg_hour):02d}:{int(avg_minute):02d}"
+    if signout_count:
+        avg = signout_minutes // signout_count
+        avg_signout_time = f"{avg // 60:02d}:{avg % 60:02d}"
     
     stats = {
         'total_days': total_days,
@@ -395,21 +621,17 @@ def employee_attendance():
 
 @app.route('/employee/wfh')
 @login_required
+@employee_required
 def employee_wfh():
     """Show admin-approved WFH dates for the logged-in employee"""
-    if not isinstance(current_user, FirebaseEmployee):
-        return redirect(url_for('employee_portal'))
-    approvals = get_firebase_service().get_all_wfh_approvals()
-    my_approvals = [ap for ap in approvals if ap.get('employee_id') == current_user.employee_id]
+    my_approvals = FirebaseWFHApproval.get_by_employee(current_user.employee_id)
     return render_template('employee_wfh.html', approvals=my_approvals)
 
 @app.route('/employee/logout')
 @login_required
+@employee_required
 def employee_logout():
     """Employee logout"""
-    if not isinstance(current_user, FirebaseEmployee):
-        return redirect(url_for('employee_portal'))
-    
     logout_user()
     flash('You have been logged out successfully.', 'success')
     return redirect(url_for('index'))
@@ -423,16 +645,18 @@ def employee_change_password():
 
 @app.route('/employee/timesheet', methods=['GET', 'POST'])
 @login_required
+@employee_required
 def employee_timesheet():
     """Employee timesheet - daily report submission"""
-    if not isinstance(current_user, FirebaseEmployee):
-        return redirect(url_for('employee_portal'))
-    
     today = datetime.now().date()
-    today_date = today.strftime('%Y-%m-%d')
+    today_date = today.isoformat()
     
-    # Get existing timesheet for today
-    existing_timesheet = FirebaseTimesheet.find_by_employee_and_date(current_user.employee_id, today)
+    # Get existing timesheet for today; on GET also prefetch the recent list in parallel
+    existing_future = _firestore_pool.submit(FirebaseTimesheet.find_by_employee_and_date, current_user.employee_id, today)
+    recent_future = None
+    if request.method == 'GET':
+        recent_future = _firestore_pool.submit(FirebaseTimesheet.get_by_employee_before, current_user.employee_id, today)
+    existing_timesheet = existing_future.result()
     
     if request.method == 'POST':
         # Get form data
@@ -475,9 +699,11 @@ def employee_timesheet():
         else:
             flash('Error saving timesheet. Please try again.', 'error')
     
-    # Get recent timesheets for display (excluding today's)
-    recent_timesheets = FirebaseTimesheet.get_by_employee(current_user.employee_id, limit=10)
-    recent_timesheets = [ts for ts in recent_timesheets if ts.date != today_date][:5]  # Show last 5 excluding today
+    # Last 5 timesheets before today; Firestore excludes today and applies the limit
+    if recent_future is not None:
+        recent_timesheets = recent_future.result()
+    else:
+        recent_timesheets = FirebaseTimesheet.get_by_employee_before(current_user.employee_id, today)
     
     return render_template('employee_timesheet.html',
                          today_date=today_date,
@@ -490,6 +716,55 @@ def admin_login():
     """Admin login page"""
     return render_template('admin_login.html')
 
+# ID-token checks (signature verification plus, on a cold cache, fetching
+# Google's signing certs) run on their own pool so a stuck fetch fails the
+# login instead of hanging it. The pool has a thread per request thread, so a
+# login normally starts verifying at once; the timeout runs from that point,
+# and only the wait for a free thread (behind stuck fetches) is bounded apart.
+ID_TOKEN_VERIFY_TIMEOUT_SECONDS = 3
+ID_TOKEN_QUEUE_TIMEOUT_SECONDS = 10
+_auth_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('GUNICORN_THREADS', 32)),
+                                    thread_name_prefix='auth')
+
+def _run_token_verify(id_token, started):
+    started.set()
+    return firebase_auth.verify_id_token(id_token)
+
+# A verified token's claims are reused (until the token expires, at most
+# ID_TOKEN_CACHE_TTL_SECONDS) when the client posts the same token again;
+# keyed by a digest so raw tokens are not kept in memory
+ID_TOKEN_CACHE_TTL_SECONDS = 300
+ID_TOKEN_CACHE_MAX_ENTRIES = 10000
+_id_token_cache = {}
+_id_token_cache_lock = threading.Lock()
+
+def _verify_id_token(id_token):
+    key = hashlib.blake2b(id_token.encode(), digest_size=16).digest()
+    now = time.time()
+    with _id_token_cache_lock:
+        entry = _id_token_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+    started = threading.Event()
+    future = _auth_executor.submit(_run_token_verify, id_token, started)
+    if not started.wait(ID_TOKEN_QUEUE_TIMEOUT_SECONDS):
+        future.cancel()
+        raise ValueError('Too many sign-ins in progress. Please try again.')
+    try:
+        decoded = future.result(timeout=ID_TOKEN_VERIFY_TIMEOUT_SECONDS)
+    except FuturesTimeoutError:
+        raise ValueError('Timed out verifying sign-in token. Please try again.')
+    expires = min(float(decoded.get('exp') or 0), now + ID_TOKEN_CACHE_TTL_SECONDS)
+    if expires > now:
+        with _id_token_cache_lock:
+            if len(_id_token_cache) >= ID_TOKEN_CACHE_MAX_ENTRIES:
+                for stale_key in [k for k, (exp, _) in _id_token_cache.items() if exp <= now]:
+                    del _id_token_cache[stale_key]
+                if len(_id_token_cache) >= ID_TOKEN_CACHE_MAX_ENTRIES:
+                    _id_token_cache.clear()
+            _id_token_cache[key] = (expires, decoded)
+    return decoded
+
 @app.route('/auth/session_login', methods=['POST'])
 def auth_session_login():
     """Verify Firebase ID token and create Flask session for employee/admin"""
@@ -501,7 +776,7 @@ def auth_session_login():
         if not id_token or not user_type:
             return jsonify({'success': False, 'message': 'Missing idToken or userType'}), 400
 
-        decoded = firebase_auth.verify_id_token(id_token)
+        decoded = _verify_id_token(id_token)
         email = decoded.get('email')
         if not email:
             return jsonify({'success': False, 'message': 'No email on Firebase user'}), 400
@@ -557,65 +832,104 @@ def auth_employee_precheck():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
+def _smtp_settings():
+    """SMTP connection settings from the environment"""
+    smtp_user = os.environ.get('SMTP_USER', '')
+    return {
+        'server': os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+        'port': int(os.environ.get('SMTP_PORT', '587')),
+        'user': smtp_user,
+        'password': os.environ.get('SMTP_PASSWORD', ''),
+        'from_email': os.environ.get('FROM_EMAIL', smtp_user),
+        'security': os.environ.get('SMTP_SECURITY', 'STARTTLS').upper(),  # STARTTLS, TLS, SSL, or NONE
+    }
+
+def _smtp_configured():
+    settings = _smtp_settings()
+    return bool(settings['user'] and settings['password'])
+
+# OTP mail is sent from these threads so signup requests don't wait on SMTP.
+# Each thread keeps its logged-in connection to skip the TLS handshake and AUTH
+# on later sends.
+_mail_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='mail')
+_smtp_local = threading.local()
+
+def _smtp_connection(settings):
+    """This thread's SMTP connection, reconnecting if it was dropped"""
+    import smtplib
+    server = getattr(_smtp_local, 'server', None)
+    if server is not None:
+        try:
+            if server.noop()[0] == 250:
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+        try:
+            server.close()
+        except Exception:
+            pass
+        _smtp_local.server = None
+    
+    # Connect based on security mode
+    if settings['security'] == 'SSL':
+        # SSL mode (usually port 465)
+        server = smtplib.SMTP_SSL(settings['server'], settings['port'])
+    elif settings['security'] in ('TLS', 'STARTTLS'):
+        # STARTTLS mode (usually port 587)
+        server = smtplib.SMTP(settings['server'], settings['port'])
+        server.starttls()
+    else:
+        # No security (not recommended, usually port 25)
+        server = smtplib.SMTP(settings['server'], settings['port'])
+    server.login(settings['user'], settings['password'])
+    _smtp_local.server = server
+    return server
+
+# The OTP mail only varies by sender, recipient and code, so the whole RFC 822
+# message is a format string: no MIME objects to build and serialize per send
+_OTP_EMAIL_TEMPLATE = "\r\n".join([
+    "From: {from_email}",
+    "To: {to_email}",
+    "Subject: Employee Account Verification OTP",
+    "MIME-Version: 1.0",
+    "Content-Type: text/plain; charset=utf-8",
+    "Content-Transfer-Encoding: 8bit",
+    "",
+    "Hello,",
+    "",
+    "You have requested to create an account for the Employee Attendance System.",
+    "",
+    "Your verification OTP is: {otp}",
+    "",
+    "This OTP is valid for 15 minutes.",
+    "",
+    "If you did not request this, please ignore this email.",
+    "",
+    "Best regards,",
+    "Attendance System Team",
+    "",
+])
+
 def send_otp_email(email: str, otp: str) -> bool:
     """Send OTP email to user"""
     try:
-        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-        smtp_user = os.environ.get('SMTP_USER', '')
-        smtp_password = os.environ.get('SMTP_PASSWORD', '')
-        from_email = os.environ.get('FROM_EMAIL', smtp_user)
-        smtp_security = os.environ.get('SMTP_SECURITY', 'STARTTLS').upper()  # STARTTLS, TLS, SSL, or NONE
-        
-        if not smtp_user or not smtp_password:
+        settings = _smtp_settings()
+        if not settings['user'] or not settings['password']:
             print("⚠️ SMTP not configured. OTP:", otp)
             return False
+        # The address goes straight into a header line
+        if '\r' in email or '\n' in email:
+            logger.warning("Refusing to send OTP email to malformed address: %r", email)
+            return False
         
-        msg = MIMEMultipart()
-        msg['From'] = from_email
-        msg['To'] = email
-        msg['Subject'] = 'Employee Account Verification OTP'
-        
-        body = f"""
-Hello,
-
-You have requested to create an account for the Employee Attendance System.
-
-Your verification OTP is: {otp}
-
-This OTP is valid for 15 minutes.
-
-If you did not request this, please ignore this email.
-
-Best regards,
-Attendance System Team
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Connect based on security mode
-        if smtp_security == 'SSL':
-            # SSL mode (usually port 465)
-            server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        elif smtp_security == 'TLS':
-            # TLS mode (usually port 587)
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-        elif smtp_security == 'STARTTLS':
-            # STARTTLS mode (usually port 587)
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-        else:
-            # No security (not recommended, usually port 25)
-            server = smtplib.SMTP(smtp_server, smtp_port)
-        
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
+        payload = _OTP_EMAIL_TEMPLATE.format(from_email=settings['from_email'], to_email=email, otp=otp)
+        _smtp_connection(settings).sendmail(settings['from_email'], [email], payload.encode('utf-8'))
         
         print(f"✅ OTP email sent to {email}")
         return True
     except Exception as e:
+        # Drop the connection so the next send starts clean
+        _smtp_local.server = None
         print(f"❌ Error sending OTP email: {e}")
         return False
 
@@ -645,10 +959,9 @@ def auth_send_signup_otp():
         
         # Generate and send OTP
         otp = service.generate_otp(email)
-        email_sent = send_otp_email(email, otp)
         
-        if not email_sent:
-            # If email failed, still return success but log OTP (for development)
+        if not _smtp_configured():
+            # Email not configured, still return success but log OTP (for development)
             print(f"⚠️ Email send failed. OTP for {email}: {otp}")
             return jsonify({
                 'success': True, 
@@ -656,7 +969,9 @@ def auth_send_signup_otp():
                 'otp': otp if os.environ.get('DEBUG_OTP', 'false').lower() == 'true' else None
             })
         
-        return jsonify({'success': True, 'message': 'OTP sent to your email'})
+        # SMTP can take seconds; send in the background and answer right away
+        _mail_executor.submit(send_otp_email, email, otp)
+        return jsonify({'success': True, 'message': 'OTP sent to your email'}), 202
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
@@ -688,7 +1003,7 @@ def auth_employee_signup():
         if not id_token:
             return jsonify({'success': False, 'message': 'Missing idToken'}), 400
 
-        decoded = firebase_auth.verify_id_token(id_token)
+        decoded = _verify_id_token(id_token)
         email = decoded.get('email')
         if not email:
             return jsonify({'success': False, 'message': 'No email on Firebase user'}), 400
@@ -730,29 +1045,54 @@ def auth_password_reset_link():
 
 @app.route('/admin/dashboard')
 @login_required
+@admin_required
 def admin_dashboard():
     """Admin dashboard"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-    
-    # Get today's attendance
     today = datetime.now().date()
-    today_attendance = FirebaseAttendance.get_by_date(today)
+    # Fingerprint what the page shows from two tiny reads - today's daily_stats
+    # document and the newest timesheet submission - plus the employees cache.
+    # A browser that already has this version gets a 304 without the day's
+    # attendance being read or the template rendered.
+    stats_future = _firestore_pool.submit(FirebaseAttendance.get_daily_stats, today)
+    latest_timesheet = FirebaseTimesheet.latest_submission()
+    stats = stats_future.result()
+    attendance_stamp = (stats.get('signed_in_count'), stats.get('signed_out_count'), stats.get('updated_at'))
+    etag = hashlib.md5(repr((today, current_user.get_id(), attendance_stamp, latest_timesheet,
+                             FirebaseEmployee.cache_stamp())).encode()).hexdigest()
+    # Pending flash messages are part of the page, so they always need a render
+    if not session.get('_flashes') and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    # Today's attendance, active employees and the timesheet preview are
+    # independent reads: run them together so the page waits for the slowest.
+    # The cached copies are keyed on the fingerprint parts, so a page tagged
+    # with a new ETag is never rendered from data older than it.
+    attendance_future = _firestore_pool.submit(
+        _dashboard_cached, ('att', today, attendance_stamp), lambda: FirebaseAttendance.get_by_date(today))
+    timesheets_future = _firestore_pool.submit(
+        _dashboard_cached, ('recent_ts', latest_timesheet),
+        lambda: FirebaseTimesheet.get_recent(limit=5))
     
-    # Get all employees
-    employees = FirebaseEmployee.get_active()
+    # Active employees, shared read-only from the employees cache
+    employees, employees_dict = FirebaseEmployee.get_active_indexed()
+    today_attendance = attendance_future.result()
     
     # Get attendance statistics
     total_employees = len(employees)
-    # Count all who signed in today (even if they already signed out)
-    signed_in_today = len([a for a in today_attendance if a.sign_in_time])
-    signed_out_today = len([a for a in today_attendance if a.sign_out_time])
+    # Count all who signed in today (even if they already signed out), in one pass
+    signed_in_today = signed_out_today = 0
+    for a in today_attendance:
+        if a.sign_in_time:
+            signed_in_today += 1
+        if a.sign_out_time:
+            signed_out_today += 1
     
     # Recent timesheets for dashboard preview
-    recent_timesheets = FirebaseTimesheet.get_recent(limit=5)
-    employees_dict = {emp.employee_id: emp for emp in employees}
+    recent_timesheets = timesheets_future.result()
 
-    return render_template('admin_dashboard.html',
+    response = app.make_response(render_template('admin_dashboard.html',
                          employees=employees,
                          today_attendance=today_attendance,
                          total_employees=total_employees,
@@ -760,25 +1100,73 @@ def admin_dashboard():
                          signed_out_today=signed_out_today,
                          recent_timesheets=recent_timesheets,
                          employees_dict=employees_dict,
-                         datetime=datetime)
+                         datetime=datetime))
+    response.set_etag(etag)
+    # Per-admin page: the browser may keep it but must revalidate every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/admin/employees')
 @login_required
+@admin_required
 def admin_employees():
     """Admin employee management"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-    
-    employees = FirebaseEmployee.get_all()
+    employees, _ = FirebaseEmployee.get_all_indexed()
     return render_template('admin_employees.html', employees=employees)
 
+# Profile images live under static/; disk writes run on these threads so they
+# overlap the employee's Firestore write instead of preceding it
+PROFILE_IMAGE_DIR = 'uploads/employee_images'
+PROFILE_IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
+_upload_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='upload')
+
+def _static_path(path):
+    """Absolute path of a file under static/; ValueError if path escapes it"""
+    static_dir = os.path.realpath(os.path.join(app.root_path, 'static'))
+    full_path = os.path.realpath(os.path.join(static_dir, path))
+    if os.path.commonpath([static_dir, full_path]) != static_dir:
+        raise ValueError(f"path outside static/: {path!r}")
+    return full_path
+
+def _write_static_file(path, data):
+    full_path = _static_path(path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'wb') as f:
+        f.write(data)
+
+def _remove_static_file(path):
+    try:
+        os.remove(_static_path(path))
+    except (OSError, ValueError):
+        pass
+
+def _save_profile_image(file, employee_id, default_extension='jpg'):
+    """Start writing an uploaded profile image in the background.
+    Returns (path relative to static/, future for the write). The upload is read
+    here because its stream is closed once the request finishes.
+    The file name is built from the admin-entered employee_id and the upload's
+    name, so both are sanitized: unknown extensions fall back to default_extension."""
+    file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+    if file_extension not in PROFILE_IMAGE_EXTENSIONS:
+        file_extension = default_extension
+    name = secure_filename(employee_id) or 'employee'
+    path = f"{PROFILE_IMAGE_DIR}/{name}_{secrets.token_hex(8)}.{file_extension}"
+    return path, _upload_executor.submit(_write_static_file, path, file.read())
+
+def _image_write_failed(upload):
+    """Wait for a background image write; True (after logging) if it failed"""
+    try:
+        upload.result()
+        return False
+    except Exception as e:
+        logger.warning("Error saving image: %s", e)
+        return True
+
 @app.route('/admin/employees/add', methods=['GET', 'POST'])
 @login_required
+@admin_required
 def admin_add_employee():
     """Add new employee"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-    
     if request.method == 'POST':
         # Get all form data
         employee_id = request.form.get('employee_id')
@@ -804,35 +1192,16 @@ def admin_add_employee():
             return render_template('admin_add_employee.html')
 
         # Check if email already exists
-        all_employees = FirebaseEmployee.get_all()
-        for emp in all_employees:
-            if emp.email.lower() == email.lower():
-                flash('Email address already exists!', 'error')
-                return render_template('admin_add_employee.html')
+        if FirebaseEmployee.email_taken(email):
+            flash('Email address already exists!', 'error')
+            return render_template('admin_add_employee.html')
 
-        # Handle profile image upload
+        # Handle profile image upload (written to disk while the employee is saved)
         profile_image_path = ''
-        if 'profile_image' in request.files:
-            file = request.files['profile_image']
-            if file and file.filename:
-                # Save the image (you might want to use a more secure method here)
-                import os
-                import uuid
-                uploads_dir = os.path.join(app.root_path, 'static', 'uploads', 'employee_images')
-                os.makedirs(uploads_dir, exist_ok=True)
-                
-                # Generate unique filename
-                file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
-                filename = f"{employee_id}_{uuid.uuid4().hex}.{file_extension}"
-                file_path = os.path.join(uploads_dir, filename)
-                
-                try:
-                    file.save(file_path)
-                    profile_image_path = f"uploads/employee_images/{filename}"
-                except Exception as e:
-                    print(f"Error saving image: {e}")
-                    flash('Error uploading profile image. Please try again.', 'error')
-                    return render_template('admin_add_employee.html')
+        upload = None
+        file = request.files.get('profile_image')
+        if file and file.filename:
+            profile_image_path, upload = _save_profile_image(file, employee_id)
 
         # Create new employee
         new_employee = FirebaseEmployee({
@@ -851,10 +1220,22 @@ def admin_add_employee():
             'is_active': True
         })
 
-        if new_employee.save():
+        saved = new_employee.save()
+        if upload and _image_write_failed(upload):
+            if not saved:
+                flash('Error uploading profile image. Please try again.', 'error')
+                return render_template('admin_add_employee.html')
+            # Don't leave the record pointing at a file that was never written
+            new_employee.profile_image = ''
+            new_employee.save()
+            flash(f'Employee {name} (ID: {employee_id}) was added, but the profile image could not be saved.', 'warning')
+            return redirect(url_for('admin_employees'))
+        if saved:
             flash(f'Employee {name} (ID: {employee_id}) has been added successfully!', 'success')
             return redirect(url_for('admin_employees'))
         else:
+            if upload:
+                _upload_executor.submit(_remove_static_file, profile_image_path)
             flash('Error adding employee. Please try again.', 'error')
             return render_template('admin_add_employee.html')
 
@@ -862,53 +1243,43 @@ def admin_add_employee():
 
 @app.route('/admin/employees/<employee_doc_id>/toggle_status', methods=['POST'])
 @login_required
+@admin_required
 def admin_toggle_employee_status(employee_doc_id):
     """Toggle employee active/inactive status"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-    
     employee = FirebaseEmployee.find_by_doc_id(employee_doc_id)
     if not employee:
-        flash('Employee not found!', 'error')
-        return redirect(url_for('admin_employees'))
+        return _post_response('Employee not found!', 'error', 'admin_employees')
     
     employee.is_active = not employee.is_active
     
     if employee.save():
         status = "activated" if employee.is_active else "deactivated"
-        flash(f'Employee {employee.name} has been {status} successfully!', 'success')
-    else:
-        flash('Error updating employee status. Please try again.', 'error')
+        return _post_response(f'Employee {employee.name} has been {status} successfully!', 'success', 'admin_employees')
     
-    return redirect(url_for('admin_employees'))
+    return _post_response('Error updating employee status. Please try again.', 'error', 'admin_employees')
 
 @app.route('/admin/employees/<employee_doc_id>/delete', methods=['POST'])
 @login_required
+@admin_required
 def admin_delete_employee(employee_doc_id):
     """Permanently delete an employee and their attendance records"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-
     employee = FirebaseEmployee.find_by_doc_id(employee_doc_id)
     if not employee:
-        flash('Employee not found!', 'error')
-        return redirect(url_for('admin_employees'))
+        return _post_response('Employee not found!', 'error', 'admin_employees')
 
     employee_name = employee.name
     if employee.delete():
-        flash(f'Employee {employee_name} and their attendance records have been deleted.', 'success')
-    else:
-        flash('Error deleting employee. Please try again.', 'error')
+        # Their attendance records went too
+        _invalidate_dashboard_cache(datetime.now().date())
+        return _post_response(f'Employee {employee_name} and their attendance records have been deleted.', 'success', 'admin_employees')
 
-    return redirect(url_for('admin_employees'))
+    return _post_response('Error deleting employee. Please try again.', 'error', 'admin_employees')
 
 @app.route('/admin/employees/<employee_doc_id>/edit', methods=['GET', 'POST'])
 @login_required
+@admin_required
 def admin_edit_employee(employee_doc_id):
     """Edit existing employee"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-    
     employee = FirebaseEmployee.find_by_doc_id(employee_doc_id)
     if not employee:
         flash('Employee not found!', 'error')
@@ -933,6 +1304,10 @@ def admin_edit_employee(employee_doc_id):
             flash('All fields are required!', 'error')
             return render_template('admin_edit_employee.html', employee=employee)
         
+        if email.lower() != (employee.email or '').lower() and FirebaseEmployee.email_taken(email, exclude_doc_id=employee.id):
+            flash('Email address already exists!', 'error')
+            return render_template('admin_edit_employee.html', employee=employee)
+        
         # Update employee
         employee.name = name
         employee.email = email
@@ -947,48 +1322,39 @@ def admin_edit_employee(employee_doc_id):
         
         # Password updates are disabled; managed via Firebase Auth
 
-        # Handle profile image upload/removal
-        import os
-        import uuid
+        # Handle profile image upload/removal; the new file is written to disk
+        # while the employee is saved, and the old one removed afterwards
         existing_image = employee.profile_image or ''
-        upload_dir = os.path.join(app.root_path, 'static', 'uploads', 'employee_images')
-        os.makedirs(upload_dir, exist_ok=True)
-
+        upload = None
         file = request.files.get('profile_image')
-        try:
-            if remove_profile_image == '1':
-                # Delete existing file if present
-                if existing_image:
-                    try:
-                        os.remove(os.path.join(app.root_path, 'static', existing_image))
-                    except Exception:
-                        pass
-                employee.profile_image = ''
-            elif file and file.filename:
-                # Save new file
-                file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else 'jpg'
-                filename = f"{employee.employee_id}_{uuid.uuid4().hex}.{file_extension}"
-                file_path = os.path.join(upload_dir, filename)
-                file.save(file_path)
-                # Remove old file
-                if existing_image:
-                    try:
-                        os.remove(os.path.join(app.root_path, 'static', existing_image))
-                    except Exception:
-                        pass
-                employee.profile_image = f"uploads/employee_images/{filename}"
-        except Exception as e:
-            print(f"Error handling profile image: {e}")
+        if remove_profile_image == '1':
+            employee.profile_image = ''
+        elif file and file.filename:
+            employee.profile_image, upload = _save_profile_image(file, employee.employee_id)
+        
+        saved = employee.save()
+        if upload and _image_write_failed(upload):
+            if saved:
+                # Point the record back at the image that is still on disk
+                employee.profile_image = existing_image
+                employee.save()
+            else:
+                employee.profile_image = existing_image
             flash('Error updating profile image. Please try again.', 'error')
             return render_template('admin_edit_employee.html', employee=employee)
+        if saved and existing_image and existing_image != employee.profile_image:
+            _upload_executor.submit(_remove_static_file, existing_image)
         
-        if employee.save():
+        if saved:
             if password:
                 flash(f'Employee {employee.name} has been updated successfully (password changed).', 'success')
             else:
                 flash(f'Employee {employee.name} has been updated successfully!', 'success')
             return redirect(url_for('admin_employees'))
         else:
+            if upload:
+                _upload_executor.submit(_remove_static_file, employee.profile_image)
+                employee.profile_image = existing_image
             flash('Error updating employee. Please try again.', 'error')
             return render_template('admin_edit_employee.html', employee=employee)
     
@@ -996,100 +1362,102 @@ def admin_edit_employee(employee_doc_id):
 
 @app.route('/admin/attendance')
 @login_required
+@admin_required
 def admin_attendance():
     """Admin attendance records"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-    
     # Get filters
     date_filter = request.args.get('date')
     status_filter = request.args.get('status')
     
-    # Get base attendance records
-    if date_filter:
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            attendance_records = FirebaseAttendance.get_by_date(filter_date)
-        except ValueError:
-            attendance_records = FirebaseAttendance.get_recent(limit=100)
-    else:
-        attendance_records = FirebaseAttendance.get_recent(limit=100)
+    # Session status is filtered by Firestore rather than in Python
+    session_status = status_filter if status_filter in ('incomplete_sessions', 'completed_sessions') else None
+    
+    # Load the employee list and its employee_id index (the template looks up
+    # each row's name there) while the page query runs
+    employees_future = _firestore_pool.submit(FirebaseEmployee.get_all_indexed)
     
-    # Apply status filter
-    if status_filter == 'incomplete_sessions':
-        # Filter for employees who signed in but didn't sign out
-        attendance_records = [record for record in attendance_records 
-                            if record.sign_in_time and not record.sign_out_time]
-    elif status_filter == 'completed_sessions':
-        # Filter for employees who completed their day
-        attendance_records = [record for record in attendance_records 
-                            if record.sign_in_time and record.sign_out_time]
+    # Get one page of attendance records. Repeat refreshes reuse the cached
+    # page until an attendance write changes the shown day's daily_stats (today's
+    # for the unfiltered listing, where sign-ins and sign-outs land)
+    page_size = _page_size_arg()
+    filter_date = _parse_date_arg(date_filter)
+    cursor = request.args.get('cursor')
+    marker = _attendance_marker(filter_date or datetime.now().date())
+    attendance_records, next_cursor = _dashboard_cached(
+        ('admin_att', marker, filter_date, session_status, page_size, cursor),
+        lambda: FirebaseAttendance.get_page(filter_date, status=session_status,
+                                            fields=FirebaseAttendance.LIST_FIELDS,
+                                            page_size=page_size, cursor=cursor))
     
-    employees = FirebaseEmployee.get_all()
-    return render_template('admin_attendance.html', 
+    employees, employees_dict = employees_future.result()
+    return _stream_page('admin_attendance.html', 
                          attendance_records=attendance_records, 
                          employees=employees,
-                         status_filter=status_filter)
+                         employees_dict=employees_dict,
+                         status_filter=status_filter,
+                         page_size=page_size,
+                         next_cursor=next_cursor,
+                         **_pagination_args(cursor))
 
 @app.route('/admin/timesheets')
 @login_required
+@admin_required
 def admin_timesheets():
     """Admin timesheet records"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-    
     # Get filters
     date_filter = request.args.get('date')
     employee_filter = request.args.get('employee_id')
     
-    # Get timesheet records based on filters
-    if date_filter and employee_filter:
-        # Filter by both date and employee
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            timesheet_records = [FirebaseTimesheet.find_by_employee_and_date(employee_filter, filter_date)]
-            timesheet_records = [record for record in timesheet_records if record is not None]
-        except ValueError:
-            timesheet_records = []
-    elif date_filter:
-        # Filter by date only
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            timesheet_records = FirebaseTimesheet.get_by_date(filter_date)
-        except ValueError:
-            timesheet_records = FirebaseTimesheet.get_recent(limit=100)
-    elif employee_filter:
-        # Filter by employee only
-        timesheet_records = FirebaseTimesheet.get_by_employee(employee_filter, limit=100)
-    else:
-        # No filters - get recent records
-        timesheet_records = FirebaseTimesheet.get_recent(limit=100)
+    # Load the dropdown's employee list while the timesheet query runs
+    employees_future = _firestore_pool.submit(FirebaseEmployee.get_all_indexed)
+    
+    # Both filters are applied by Firestore in one query (cached like
+    # admin_attendance, keyed on the newest submission: every save sets it)
+    filter_date = _parse_date_arg(date_filter)
+    page_size = _page_size_arg()
+    cursor = request.args.get('cursor')
+    timesheet_records, next_cursor = _dashboard_cached(
+        ('admin_ts', FirebaseTimesheet.latest_submission(), employee_filter or None, filter_date, page_size, cursor),
+        lambda: FirebaseTimesheet.query(employee_filter or None, filter_date,
+                                        limit=page_size, cursor=cursor))
     
-    # Get all employees for dropdown and employee lookup
-    employees = FirebaseEmployee.get_all()
-    employees_dict = {emp.employee_id: emp for emp in employees}
+    # Resolve names from the dropdown list; only employees missing from it
+    # (e.g. a stale cached list) need the batched lookup
+    employees, employees_dict = employees_future.result()
+    missing = {record.employee_id for record in timesheet_records} - employees_dict.keys()
+    if missing:
+        # Copy first: the cached index is shared between requests
+        employees_dict = dict(employees_dict)
+        employees_dict.update((emp.employee_id, emp) for emp in FirebaseEmployee.get_by_ids(missing))
+    # Join once here so the template reads an attribute per row instead of a dict lookup
+    for record in timesheet_records:
+        record.employee = employees_dict.get(record.employee_id)
     
-    return render_template('admin_timesheets.html', 
+    return _stream_page('admin_timesheets.html', 
                          timesheet_records=timesheet_records, 
                          employees=employees,
-                         employees_dict=employees_dict)
+                         page_size=page_size,
+                         next_cursor=next_cursor,
+                         **_pagination_args(cursor))
 
 @app.route('/admin/manage-team')
 @login_required
+@admin_required
 def admin_manage_team():
     """Manage the Team page - filters + table UI"""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-
-    employees = FirebaseEmployee.get_all()
-    total_employees = len(employees)
-    # online: employees with a sign-in but no sign-out today
+    # Independent reads; overlap them
     today = datetime.now().date()
-    today_attendance = FirebaseAttendance.get_by_date(today)
-    online_ids = {a.employee_id for a in today_attendance if a.sign_in_time and not a.sign_out_time}
+    stats_future = _firestore_pool.submit(FirebaseAttendance.get_daily_stats, today)
+    approvals_future = _firestore_pool.submit(get_firebase_service().get_all_wfh_approvals)
+    employees, employees_dict = FirebaseEmployee.get_all_indexed()
+    total_employees = len(employees)
+    # online: employees with a sign-in but no sign-out today, from the one
+    # daily_stats document rather than the day's attendance records
+    # (ignoring anyone deleted since they signed in)
+    online_ids = {emp_id for emp_id in stats_future.result().get('online_employee_ids', []) if emp_id in employees_dict}
     online_count = len(online_ids)
 
-    approvals = get_firebase_service().get_all_wfh_approvals()
+    approvals = approvals_future.result()
     return render_template(
         'admin_manage_team.html',
         employees=employees,
@@ -1101,9 +1469,8 @@ def admin_manage_team():
 
 @app.route('/admin/wfh/approve', methods=['POST'])
 @login_required
+@admin_required
 def admin_wfh_approve():
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
     employee_id = request.form.get('employee_id')
     start_date = request.form.get('start_date')
     end_date = request.form.get('end_date')
@@ -1112,110 +1479,52 @@ def admin_wfh_approve():
         return redirect(url_for('admin_manage_team'))
     ok = FirebaseWFHApproval.approve(employee_id, start_date, end_date, approved_by=current_user.username)
     if ok:
+        _invalidate_wfh_cache()
         flash('WFH approved successfully.', 'success')
     else:
         flash('Failed to approve WFH. Please try again.', 'error')
     return redirect(url_for('admin_manage_team'))
 
-
-# -------------------- Payroll helpers removed --------------------
-def _calculate_monthly_hours(employee_id: str, year: int, month: int):
-    """Aggregate attendance hours for an employee within yyyy-mm."""
-    # Get up to ~62 records to cover month; filtering client-side as attendance query lacks date range
-    records = FirebaseAttendance.get_by_employee(employee_id, limit=200)
-    target_prefix = f"{year:04d}-{month:02d}-"
-    month_records = [r for r in records if isinstance(r.date, str) and r.date.startswith(target_prefix)]
-    total_hours = sum([float(r.total_hours or 0) for r in month_records])
-    return total_hours, month_records
-
-def _calculate_employee_month_stats(employee_id: str, year: int, month: int):
-    """Return stats for a given employee and month: total_hours, worked_days, absent_days, overtime_hours."""
-    import calendar
-    total_hours, month_records = _calculate_monthly_hours(employee_id, year, month)
-    # Unique days with any sign-in
-    worked_days = len({r.date for r in month_records if r.sign_in_time})
-    days_in_month = calendar.monthrange(year, month)[1]
-    absent_days = max(0, days_in_month - worked_days)
-    # Derive overtime using config defaults and (if set) employee settings
-    # Payroll-specific settings removed; keep attendance stats helper minimal
-    std_hours_per_day = Config.WORKING_HOURS_END - Config.WORKING_HOURS_START
-    working_days = Config.PAYROLL_WORKING_DAYS_PER_MONTH
-    standard_month_hours = std_hours_per_day * working_days
-    overtime_hours = max(0.0, total_hours - standard_month_hours)
-    return {
-        'total_hours': round(total_hours, 2),
-        'worked_days': worked_days,
-        'absent_days': absent_days,
-        'overtime_hours': round(overtime_hours, 2),
-        'days_in_month': days_in_month,
-    }
-
-def _calculate_payslip_preview(*args, **kwargs):
-    return {}
-def _generate_payslip_for_employee(*args, **kwargs):
-    return None
-
-    
-
-    
-
-    
-
-    
-
-
 @app.route('/admin/timesheets/download')
 @login_required
+@admin_required
 def admin_timesheets_download():
     """Download filtered timesheets as CSV. Requires at least one filter."""
-    if not isinstance(current_user, FirebaseAdmin):
-        return redirect(url_for('admin_login'))
-
     date_filter = request.args.get('date')
     employee_filter = request.args.get('employee_id')
     if not (date_filter or employee_filter):
         flash('Please apply a filter (date and/or employee) before downloading.', 'error')
         return redirect(url_for('admin_timesheets'))
 
-    # Get filtered timesheets
-    if date_filter and employee_filter:
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            timesheet_records = [FirebaseTimesheet.find_by_employee_and_date(employee_filter, filter_date)]
-            timesheet_records = [record for record in timesheet_records if record is not None]
-        except ValueError:
-            timesheet_records = []
+    # Get filtered timesheets (a malformed date matches nothing). The larger
+    # exports are iterated as Firestore streams them, so CSV rows go out while
+    # later documents are still arriving.
+    filter_date = _parse_date_arg(date_filter)
+    if date_filter and not filter_date:
+        timesheet_records = []
+    elif date_filter and employee_filter:
+        timesheet_records = list(FirebaseTimesheet.find_by_employee_and_dates(employee_filter, [filter_date]).values())
     elif date_filter:
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            timesheet_records = FirebaseTimesheet.get_by_date(filter_date)
-        except ValueError:
-            timesheet_records = []
+        timesheet_records = FirebaseTimesheet.stream(date=filter_date)
     else:
-        timesheet_records = FirebaseTimesheet.get_by_employee(employee_filter, limit=1000)
-
-    employees = FirebaseEmployee.get_all()
-    employees_dict = {emp.employee_id: emp for emp in employees}
+        timesheet_records = FirebaseTimesheet.stream(employee_filter, limit=1000)
+
+    _, employees_dict = FirebaseEmployee.get_all_indexed()
+
+    def rows():
+        for ts in timesheet_records:
+            emp = employees_dict.get(ts.employee_id)
+            # Combine all available text fields into one block
+            parts = [p for p in (ts.tasks_completed, ts.challenges_faced, ts.achievements, ts.tomorrow_plans, ts.additional_notes) if p]
+            yield (
+                ts.date,
+                ts.employee_id,
+                (emp.name if emp else ''),
+                (emp.department if emp else ''),
+                (ts.submitted_at or '')[:19],
+                "\n\n".join(parts)
+            )
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    # Restore main columns, and compress all text fields into a single Time Sheet column
-    writer.writerow(['Date','Employee ID','Employee Name','Department','Submitted At','Time Sheet'])
-    for ts in timesheet_records:
-        emp = employees_dict.get(ts.employee_id)
-        # Combine all available text fields into one block
-        parts = [p for p in [ts.tasks_completed, ts.challenges_faced, ts.achievements, ts.tomorrow_plans, ts.additional_notes] if p]
-        timesheet_text = "\n\n".join(parts)
-        writer.writerow([
-            ts.date,
-            ts.employee_id,
-            (emp.name if emp else ''),
-            (emp.department if emp else ''),
-            (ts.submitted_at[:19] if ts.submitted_at else ''),
-            timesheet_text
-        ])
-
-    csv_bytes = io.BytesIO(output.getvalue().encode('utf-8-sig'))
     filename_parts = ['timesheets']
     if date_filter:
         filename_parts.append(date_filter)
@@ -1223,7 +1532,8 @@ def admin_timesheets_download():
         filename_parts.append(employee_filter)
     filename = '_'.join(filename_parts) + '.csv'
 
-    return send_file(csv_bytes, as_attachment=True, download_name=filename, mimetype='text/csv')
+    # Restore main columns, and compress all text fields into a single Time Sheet column
+    return _stream_csv(rows(), ['Date','Employee ID','Employee Name','Department','Submitted At','Time Sheet'], filename)
 
     
 
@@ -1237,30 +1547,49 @@ def admin_logout():
 @app.route('/debug/create_test_attendance/<employee_id>')
 def create_test_attendance(employee_id):
     """Debug route to create test attendance data"""
+    # Writes arbitrary records; only reachable when the app runs in debug mode
+    if not app.debug:
+        abort(404)
     try:
-        from datetime import datetime
-        print(f"DEBUG: Creating test attendance for {employee_id}")
+        logger.debug("Creating test attendance for %s", employee_id)
         
+        now = datetime.now()
+        today_str = now.date().isoformat()
         test_attendance = FirebaseAttendance({
             'employee_id': employee_id,
-            'date': datetime.now().strftime('%Y-%m-%d'),
-            'sign_in_time': datetime.now().replace(hour=9, minute=0).isoformat(),
-            'sign_out_time': datetime.now().replace(hour=17, minute=30).isoformat(),
+            'date': today_str,
+            'sign_in_time': now.replace(hour=9, minute=0).isoformat(),
+            'sign_out_time': now.replace(hour=17, minute=30).isoformat(),
             'total_hours': 8.5
         })
         
-        print(f"DEBUG: Test attendance object created: {test_attendance.to_dict()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Test attendance object created: %s", test_attendance.to_dict())
         
         if test_attendance.save():
-            print(f"DEBUG: Successfully saved test attendance")
-            return f"✅ Test attendance created for {employee_id} on {datetime.now().strftime('%Y-%m-%d')}"
+            logger.debug("Successfully saved test attendance")
+            return f"✅ Test attendance created for {employee_id} on {today_str}"
         else:
-            print(f"DEBUG: Failed to save test attendance")
+            logger.debug("Failed to save test attendance")
             return f"❌ Failed to create test attendance for {employee_id}"
     except Exception as e:
-        print(f"DEBUG: Exception in create_test_attendance: {e}")
+        logger.debug("Exception in create_test_attendance: %s", e)
         return f"❌ Error: {e}"
 
+# Sample employees are development fixtures with published passwords, so their
+# hashes use a cheap work factor; the default admin keeps Werkzeug's default
+SAMPLE_PASSWORD_HASH_METHOD = 'pbkdf2:sha256:10000'
+
+@functools.lru_cache(maxsize=None)
+def _hash_seed_password(password, method=None):
+    """Hash a default/sample password once per process; the seed passwords are fixed,
+    so repeated create_sample_data() calls reuse the (slow, salted) hash"""
+    # Only needed for seeding at startup, not by any request handler
+    from werkzeug.security import generate_password_hash
+    if method is None:
+        return generate_password_hash(password)
+    return generate_password_hash(password, method=method)
+
 def create_sample_data():
     """Create sample data for testing"""
     print("🔥 Initializing Firebase database...")
@@ -1270,7 +1599,7 @@ def create_sample_data():
     if not admin:
         admin = FirebaseAdmin({
             'username': Config.DEFAULT_ADMIN_USERNAME,
-            'password_hash': generate_password_hash(Config.DEFAULT_ADMIN_PASSWORD),
+            'password_hash': _hash_seed_password(Config.DEFAULT_ADMIN_PASSWORD),
             'name': Config.DEFAULT_ADMIN_NAME
         })
         if admin.save():
@@ -1280,20 +1609,32 @@ def create_sample_data():
     
     if Config.SEED_SAMPLE_DATA:
         print("🌱 Seeding sample employees...")
-        # Create sample employees
-        for emp_data in Config.SAMPLE_EMPLOYEES:
-            existing_employee = FirebaseEmployee.find_by_employee_id(emp_data['employee_id'])
-            if not existing_employee:
-                emp_copy = dict(emp_data)
-                # Hash the password before creating employee
-                password = emp_copy.pop('password')
-                emp_copy['password_hash'] = generate_password_hash(password)
-                employee = FirebaseEmployee(emp_copy)
-                if employee.save():
-                    print(f"✅ Sample employee created: {emp_data['employee_id']}")
-                else:
-                    print(f"❌ Failed to create sample employee: {emp_data['employee_id']}")
+        # Create sample employees; one 'in' query per 30 ids finds those already there
+        existing_ids = {emp.employee_id for emp in FirebaseEmployee.get_by_ids(
+            emp_data['employee_id'] for emp_data in Config.SAMPLE_EMPLOYEES)}
+        missing = [emp_data for emp_data in Config.SAMPLE_EMPLOYEES
+                   if emp_data['employee_id'] not in existing_ids]
+        # Password hashing is deliberately slow; hashlib's KDFs release the GIL,
+        # so hash all missing employees' passwords in parallel threads
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            password_hashes = list(pool.map(functools.partial(_hash_seed_password,
+                                                              method=SAMPLE_PASSWORD_HASH_METHOD),
+                                            [emp_data['password'] for emp_data in missing]))
+        new_employees = []
+        for emp_data, password_hash in zip(missing, password_hashes):
+            emp_copy = dict(emp_data)
+            emp_copy.pop('password')
+            emp_copy['password_hash'] = password_hash
+            new_employees.append(FirebaseEmployee(emp_copy))
+        # One batched write for all of them instead of a round-trip per employee
+        if new_employees:
+            if FirebaseEmployee.save_all(new_employees):
+                for employee in new_employees:
+                    print(f"✅ Sample employee created: {employee.employee_id}")
+            else:
+                print(f"❌ Failed to create sample employees: {', '.join(e.employee_id for e in new_employees)}")
 
+# Local development only; production runs under gunicorn (see gunicorn_conf.py)
 if __name__ == '__main__':
     create_sample_data()
     port = int(os.environ.get('PORT', 5000))
@@ -59,9 +59,8 @@ def is_within_office_geofence(lat, lon):
             print(f"DEBUG Geofence: user=({user_lat}, {user_lon}) is within {office_name}")
         else:
             print(f"DEBUG Geofence: user=({user_lat}, {user_lon}) is not within any office location")
-            # Debug: show distances to all offices
-            for office in Config.OFFICE_LOCATIONS:
-                distance = haversine_distance_m(user_lat, user_lon, office['latitude'], office['longitude'])
+            # Debug: show distances to all offices, from the precomputed office table
+            for office, distance in Config.office_distances_m(user_lat, user_lon):
                 print(f"  - Distance to {office['name']}: {distance:.2f}m (radius: {office['radius_meters']}m)")
         
         return is_within
@@ -405,8 +404,8 @@ def admin_dashboard():
     today = datetime.now().date()
     today_attendance = FirebaseAttendance.get_by_date(today)
     
-    # Get all employees
-    employees = FirebaseEmployee.get_active()
+    # Get all employees, and the employee_id index the template looks rows up in
+    employees, employees_dict = FirebaseEmployee.get_active_indexed()
     
     # Get attendance statistics
     total_employees = len(employees)
@@ -419,6 +418,7 @@ def admin_dashboard():
                          total_employees=total_employees,
                          signed_in_today=signed_in_today,
                          signed_out_today=signed_out_today,
+                         employees_dict=employees_dict,
                          datetime=datetime)
 
 @app.route('/admin/employees')
@@ -582,8 +582,9 @@ def admin_attendance():
     else:
         attendance_records = FirebaseAttendance.get_recent(limit=100)
     
-    employees = FirebaseEmployee.get_all()
-    return render_template('admin_attendance.html', attendance_records=attendance_records, employees=employees)
+    employees, employees_dict = FirebaseEmployee.get_all_indexed()
+    return render_template('admin_attendance.html', attendance_records=attendance_records,
+                           employees=employees, employees_dict=employees_dict)
 
 @app.route('/admin/logout')
 @login_required
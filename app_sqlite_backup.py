@@ -26,6 +26,7 @@ class Employee(UserMixin, db.Model):
     department = db.Column(db.String(50), nullable=False)
     password_hash = db.Column(db.String(120), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
+    is_admin = False
 
     def get_id(self):
         return f"employee-{self.id}"
@@ -35,6 +36,7 @@ class Admin(UserMixin, db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(120), nullable=False)
     name = db.Column(db.String(100), nullable=False)
+    is_admin = True
 
     def get_id(self):
         return f"admin-{self.id}"
@@ -1,4 +1,6 @@
 import os
+import math
+import tempfile
 from datetime import datetime
 
 class Config:
@@ -72,6 +74,11 @@ class Config:
     APP_NAME = 'Employee Attendance System'
     APP_VERSION = '1.0.0'
     DEBUG = os.environ.get('FLASK_ENV') != 'production'
+    # Level for this app's own loggers (e.g. DEBUG to trace geofence checks in
+    # production); defaults to DEBUG in development and INFO otherwise
+    LOG_LEVEL = os.environ.get('LOG_LEVEL')
+    # Compiled Jinja templates are kept here in production so restarted workers skip recompiling
+    JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'attendance-jinja-cache')
     
     # Time Settings
     WORKING_HOURS_START = 10 
@@ -112,36 +119,128 @@ class Config:
         now = datetime.now()
         return Config.WORKING_HOURS_START <= now.hour < Config.WORKING_HOURS_END
     
+    @staticmethod
+    def office_distances_m(user_latitude, user_longitude):
+        """
+        Great-circle distance from the user to every office location. Only needed
+        for diagnostics (the geofence itself compares haversine terms), so every
+        office gets a real distance, however far away it is.
+        Returns: list of (office, distance_meters) in OFFICE_LOCATIONS order
+        """
+        diameter = 2 * EARTH_RADIUS_METERS
+        phi1 = math.radians(user_latitude)
+        lmb1 = math.radians(user_longitude)
+        cos_phi1 = math.cos(phi1)
+        distances = []
+        for office, _, _, _, phi2, lmb2, cos_phi2, _ in _OFFICE_TABLE:
+            a = math.sin((phi2 - phi1) * 0.5)**2 + cos_phi1 * cos_phi2 * math.sin((lmb2 - lmb1) * 0.5)**2
+            distances.append((office, diameter * math.asin(math.sqrt(min(a, 1.0)))))
+        return distances
+
+    @staticmethod
+    def check_office_location(user_latitude, user_longitude):
+        """
+        Geofence check: the coarse cell picks the candidate offices, each of
+        which is then checked exactly on the user's real coordinates.
+        Returns: (office_name, office_index), or (None, None) outside every office
+        """
+        user_latitude, user_longitude = float(user_latitude), float(user_longitude)
+        phi1 = math.radians(user_latitude)
+        cos_phi1 = math.cos(phi1)
+        # Only offices sharing the user's cell can contain them
+        for index in _OFFICE_CELLS.get(_office_cell(user_latitude, user_longitude), ()):
+            office_name = _office_match(index, user_latitude, user_longitude, phi1, cos_phi1)
+            if office_name:
+                return office_name, index
+        return None, None
+
+    @staticmethod
+    def is_within_office_index(index, user_latitude, user_longitude):
+        """
+        Check a single office (by position in OFFICE_LOCATIONS) without scanning the rest.
+        Returns: office name if the user is inside its radius, else None
+        """
+        if not 0 <= index < len(_OFFICE_TABLE):
+            return None
+        phi1 = math.radians(user_latitude)
+        return _office_match(index, user_latitude, user_longitude, phi1, math.cos(phi1))
+
     @staticmethod
     def is_within_office_location(user_latitude, user_longitude):
         """
         Check if user's location is within any of the defined office locations
         Returns: (is_within_office, office_name) - tuple of boolean and office name if found
         """
-        import math
-        
-        def calculate_distance(lat1, lon1, lat2, lon2):
-            """Calculate distance between two points using Haversine formula"""
-            # Convert latitude and longitude from degrees to radians
-            lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-            
-            # Haversine formula
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-            c = 2 * math.asin(math.sqrt(a))
-            
-            # Radius of earth in meters
-            r = 6371000
-            return c * r
-        
-        for office in Config.OFFICE_LOCATIONS:
-            distance = calculate_distance(
-                user_latitude, user_longitude,
-                office['latitude'], office['longitude']
-            )
-            
-            if distance <= office['radius_meters']:
-                return True, office['name']
-        
-        return False, None 
+        office_name, _ = Config.check_office_location(user_latitude, user_longitude)
+        return office_name is not None, office_name
+
+
+# Radius of earth in meters
+EARTH_RADIUS_METERS = 6371000.0
+
+# Metres per degree of latitude, and extra margin so the bounding-box
+# prefilter never rejects a point the haversine would accept
+METERS_PER_DEGREE = 111320.0
+_BBOX_SLACK_METERS = 50.0
+
+# Office coordinates never change between requests, so derive everything the
+# geofence check needs once instead of on every request:
+# (office, lat_deg, lon_deg, bbox_span_deg, lat_rad, lon_rad, cos(lat), max_hav)
+# where max_hav is the haversine term at exactly radius_meters: a point is
+# inside the office radius iff its haversine term is <= max_hav.
+# The table is deliberately scalar: with a handful of offices, staging NumPy
+# arrays per call costs more than the bounding-box-filtered loop it replaces
+def _build_office_table(offices):
+    return [
+        (office,
+         float(office['latitude']),
+         float(office['longitude']),
+         (float(office['radius_meters']) + _BBOX_SLACK_METERS) / METERS_PER_DEGREE,
+         math.radians(office['latitude']),
+         math.radians(office['longitude']),
+         math.cos(math.radians(office['latitude'])),
+         math.sin(min(float(office['radius_meters']) / (2 * EARTH_RADIUS_METERS), math.pi / 2))**2)
+        for office in offices
+    ]
+
+# Offices bucketed by the coarse lat/lon cells their bounding box overlaps,
+# so a check only visits offices near the user instead of scanning them all
+_OFFICE_CELL_DEG = 0.1
+
+def _office_cell(lat, lon):
+    return math.floor(lat / _OFFICE_CELL_DEG), math.floor(lon / _OFFICE_CELL_DEG)
+
+def _build_office_cells(table):
+    cells = {}
+    for index, (_, lat_deg, lon_deg, span_deg, _, _, cos_phi2, _) in enumerate(table):
+        lon_span = span_deg / max(cos_phi2, 1e-6)
+        lat_lo, lon_lo = _office_cell(lat_deg - span_deg, lon_deg - lon_span)
+        lat_hi, lon_hi = _office_cell(lat_deg + span_deg, lon_deg + lon_span)
+        for lat_cell in range(lat_lo, lat_hi + 1):
+            for lon_cell in range(lon_lo, lon_hi + 1):
+                cells.setdefault((lat_cell, lon_cell), []).append(index)
+    # Indices are appended in OFFICE_LOCATIONS order, which keeps its priority
+    return {cell: tuple(indices) for cell, indices in cells.items()}
+
+_OFFICE_TABLE = _build_office_table(Config.OFFICE_LOCATIONS)
+_OFFICE_CELLS = _build_office_cells(_OFFICE_TABLE)
+
+def _office_match(index, user_latitude, user_longitude, phi1, cos_phi1):
+    """Name of office `index` if the user is inside its radius, else None.
+    phi1/cos_phi1 are the user's latitude in radians and its cosine, computed
+    once by the caller; the office's side comes from the precomputed table."""
+    office, lat_deg, lon_deg, span_deg, phi2, lmb2, cos_phi2, max_hav = _OFFICE_TABLE[index]
+    if (abs(user_latitude - lat_deg) > span_deg or
+            abs(user_longitude - lon_deg) * cos_phi1 > span_deg):
+        return None
+    # Compare the haversine term against the office's precomputed bound
+    # instead of turning it into metres (saves the asin and sqrt)
+    a = (math.sin((phi2 - phi1) * 0.5)**2 +
+         cos_phi1 * cos_phi2 * math.sin((lmb2 - math.radians(user_longitude)) * 0.5)**2)
+    return office['name'] if a <= max_hav else None
+
+def reload_office_locations():
+    """Rebuild the precomputed office table after Config.OFFICE_LOCATIONS changes"""
+    global _OFFICE_TABLE, _OFFICE_CELLS
+    _OFFICE_TABLE = _build_office_table(Config.OFFICE_LOCATIONS)
+    _OFFICE_CELLS = _build_office_cells(_OFFICE_TABLE)
@@ -1,12 +1,96 @@
+from flask import g, has_request_context
 from flask_login import UserMixin
 from datetime import datetime
 from firebase_service import get_firebase_service
 from werkzeug.security import check_password_hash
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
+from urllib.parse import quote
+import functools
+import hashlib
+import threading
+import time
+
+# Firestore rejects document ids longer than this many bytes
+MAX_DOC_ID_BYTES = 1500
+
+# FirebaseEmployee.get_all() results are reused for this long (per process).
+# 'entry' holds the raw dicts plus the shared list/by_id index built from them.
+EMPLOYEE_CACHE_TTL_SECONDS = 60
+_employees_cache = {'entry': None, 'expires': 0.0, 'generation': 0}
+_employees_cache_lock = threading.Lock()
+
+# Flask-Login reloads the logged-in user's document on every request; reuse it
+# briefly. Keyed by ('employee' | 'admin', doc_id), dropped when that user is saved.
+# Only the worker that handled the save drops it: other workers keep serving a
+# deactivated or deleted user for up to the TTL, so keep it short (the employee
+# routes that write re-check the user uncached anyway).
+USER_CACHE_TTL_SECONDS = 5
+USER_CACHE_MAX_ENTRIES = 4096
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+def _cached_user_data(key, loader) -> Optional[Dict[str, Any]]:
+    """Return the cached document for key, calling loader() if missing or expired"""
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+    data = loader()
+    if data:
+        with _user_cache_lock:
+            if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+                for stale_key in [k for k, (expires, _) in _user_cache.items() if expires <= now]:
+                    del _user_cache[stale_key]
+                if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+                    _user_cache.clear()
+            _user_cache[key] = (now + USER_CACHE_TTL_SECONDS, data)
+    return data
+
+def _forget_user_data(key):
+    with _user_cache_lock:
+        _user_cache.pop(key, None)
+
+def request_cached(func):
+    """Memoize func on flask.g for the rest of the current request, so one request
+    never repeats the same read. Outside a request (e.g. on a pool thread) it just
+    calls func. Model writes call clear_request_cache()."""
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        if not has_request_context():
+            return func(*args, **kwargs)
+        cache = g.setdefault('_fb_cache', {})
+        key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = func(*args, **kwargs)
+        return cache[key]
+    return wrapped
+
+def clear_request_cache():
+    """Forget this request's memoized reads (after a write)"""
+    if has_request_context():
+        g.pop('_fb_cache', None)
+
+def _date_str(value) -> str:
+    """YYYY-MM-DD key for a date or datetime (a key string passes through);
+    isoformat() skips strftime's format parsing"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+def _next_cursor(records: List[Dict[str, Any]], page_size: int) -> Optional[str]:
+    """Cursor for the page after `records`, or None when this page was the last"""
+    if not records or len(records) < page_size:
+        return None
+    return get_firebase_service().encode_cursor(records[-1]['id'])
 
 class FirebaseEmployee(UserMixin):
     """Firebase Employee model for Flask-Login"""
     
+    is_admin = False
+    
     def __init__(self, employee_data: Dict[str, Any]):
         self.id = employee_data.get('id')  # Firestore document ID
         self.employee_id = employee_data.get('employee_id')
@@ -43,6 +127,7 @@ class FirebaseEmployee(UserMixin):
         return check_password_hash(self.password_hash, password)
     
     @staticmethod
+    @request_cached
     def find_by_employee_id(employee_id: str) -> Optional['FirebaseEmployee']:
         """Find employee by employee_id"""
         firebase_service = get_firebase_service()
@@ -52,19 +137,111 @@ class FirebaseEmployee(UserMixin):
         return None
     
     @staticmethod
-    def find_by_doc_id(doc_id: str) -> Optional['FirebaseEmployee']:
-        """Find employee by Firestore document ID"""
+    @request_cached
+    def find_by_doc_id(doc_id: str, cached: bool = False) -> Optional['FirebaseEmployee']:
+        """Find employee by Firestore document ID.
+        cached=True may return data up to USER_CACHE_TTL_SECONDS old (for the session user loader)."""
         firebase_service = get_firebase_service()
-        employee_data = firebase_service.get_employee_by_doc_id(doc_id)
+        if cached:
+            employee_data = _cached_user_data(('employee', doc_id),
+                                              lambda: firebase_service.get_employee_by_doc_id(doc_id))
+        else:
+            employee_data = firebase_service.get_employee_by_doc_id(doc_id)
         if employee_data:
             return FirebaseEmployee(employee_data)
         return None
     
     @staticmethod
-    def get_all() -> List['FirebaseEmployee']:
-        """Get all employees"""
+    def _cached_entry() -> Dict[str, Any]:
+        """The employees cache entry, reloading it from Firestore when missing or expired"""
+        with _employees_cache_lock:
+            entry = _employees_cache['entry']
+            if entry is not None and _employees_cache['expires'] > time.monotonic():
+                return entry
+            generation = _employees_cache['generation']
         firebase_service = get_firebase_service()
         employees_data = firebase_service.get_all_employees()
+        employees = [FirebaseEmployee(emp_data) for emp_data in employees_data]
+        active = [emp for emp in employees if emp._is_active]
+        entry = {
+            'data': employees_data,
+            'list': employees,
+            'by_id': {emp.employee_id: emp for emp in employees},
+            'active': active,
+            'active_by_id': {emp.employee_id: emp for emp in active},
+            'by_email': {emp.email.lower(): emp for emp in employees if emp.email},
+            # Same on every worker that loaded the same employees
+            'stamp': hashlib.md5(repr(sorted(
+                (emp.id, emp.employee_id, emp._is_active, str(data.get('updated_at')))
+                for emp, data in zip(employees, employees_data))).encode()).hexdigest(),
+        }
+        with _employees_cache_lock:
+            # Skip storing if a write invalidated the cache while we were reading
+            if employees_data and _employees_cache['generation'] == generation:
+                _employees_cache['entry'] = entry
+                _employees_cache['expires'] = time.monotonic() + EMPLOYEE_CACHE_TTL_SECONDS
+        return entry
+    
+    @staticmethod
+    def get_all() -> List['FirebaseEmployee']:
+        """Get all employees (cached for EMPLOYEE_CACHE_TTL_SECONDS, cleared on employee writes)"""
+        # Build fresh objects on every call so callers can modify them without
+        # touching the cache or each other (read-only callers use get_all_indexed)
+        return [FirebaseEmployee(emp_data) for emp_data in FirebaseEmployee._cached_entry()['data']]
+    
+    @staticmethod
+    def get_all_indexed() -> Tuple[List['FirebaseEmployee'], Dict[str, 'FirebaseEmployee']]:
+        """Get (employees, employees_by_employee_id) from the cache without rebuilding either.
+        Both are shared between requests: treat them as read-only."""
+        entry = FirebaseEmployee._cached_entry()
+        return entry['list'], entry['by_id']
+    
+    @staticmethod
+    def get_active_indexed() -> Tuple[List['FirebaseEmployee'], Dict[str, 'FirebaseEmployee']]:
+        """Like get_all_indexed(), restricted to active employees. Read-only."""
+        entry = FirebaseEmployee._cached_entry()
+        return entry['active'], entry['active_by_id']
+    
+    @staticmethod
+    def email_taken(email: str, exclude_doc_id: Optional[str] = None) -> bool:
+        """True if another employee (not exclude_doc_id) has this email, ignoring case.
+        One indexed query on email_lower; employees saved before that field existed
+        are covered by the employees cache until backfilled."""
+        email_lower = (email or '').lower()
+        firebase_service = get_firebase_service()
+        if any(doc_id != exclude_doc_id
+               for doc_id in firebase_service.get_employee_doc_ids_by_email_lower(email_lower)):
+            return True
+        cached = FirebaseEmployee.find_cached_by_email(email_lower)
+        return cached is not None and cached.id != exclude_doc_id
+    
+    @staticmethod
+    def cache_stamp() -> str:
+        """Fingerprint of the cached employees (ids, active flags and last update
+        times); changes when an employee is added, edited, deactivated or deleted"""
+        return FirebaseEmployee._cached_entry()['stamp']
+    
+    @staticmethod
+    def find_cached_by_email(email: str) -> Optional['FirebaseEmployee']:
+        """Case-insensitive email lookup in the employees cache (shared, read-only)"""
+        return FirebaseEmployee._cached_entry()['by_email'].get((email or '').lower())
+    
+    @staticmethod
+    def invalidate_cache():
+        """Forget the cached get_all() result (and this request's memoized reads)"""
+        with _employees_cache_lock:
+            _employees_cache['entry'] = None
+            _employees_cache['generation'] += 1
+        clear_request_cache()
+    
+    @staticmethod
+    def get_by_ids(employee_ids: Iterable[str]) -> List['FirebaseEmployee']:
+        """Get only the employees with the given employee_ids"""
+        employee_ids = [emp_id for emp_id in set(employee_ids) if emp_id]
+        if not employee_ids:
+            return []
+        firebase_service = get_firebase_service()
+        employees_data = firebase_service.get_employees_by_ids(employee_ids)
         return [FirebaseEmployee(emp_data) for emp_data in employees_data]
     
     @staticmethod
@@ -73,13 +250,14 @@ class FirebaseEmployee(UserMixin):
         all_employees = FirebaseEmployee.get_all()
         return [emp for emp in all_employees if emp._is_active]
     
-    def save(self) -> bool:
-        """Save employee to Firebase"""
-        firebase_service = get_firebase_service()
-        employee_data = {
+    def _firestore_data(self) -> Dict[str, Any]:
+        """Fields persisted to the employees collection"""
+        return {
             'employee_id': self.employee_id,
             'name': self.name,
             'email': self.email,
+            # Lowercased copy so uniqueness checks are one equality query
+            'email_lower': (self.email or '').lower(),
             'department': self.department,
             'password_hash': self.password_hash,
             'is_active': self._is_active,
@@ -92,8 +270,15 @@ class FirebaseEmployee(UserMixin):
             'emergency_contact_phone': self.emergency_contact_phone,
             'blood_group': self.blood_group
         }
+    
+    def save(self) -> bool:
+        """Save employee to Firebase"""
+        firebase_service = get_firebase_service()
+        employee_data = self._firestore_data()
         
+        FirebaseEmployee.invalidate_cache()
         if self.id:
+            _forget_user_data(('employee', self.id))
             # Update existing employee
             return firebase_service.update_employee(self.id, employee_data)
         else:
@@ -105,11 +290,26 @@ class FirebaseEmployee(UserMixin):
             except Exception:
                 return False
     
+    @staticmethod
+    def save_all(employees: List['FirebaseEmployee']) -> bool:
+        """Create several new employees with batched writes instead of one RPC each"""
+        firebase_service = get_firebase_service()
+        FirebaseEmployee.invalidate_cache()
+        try:
+            doc_ids = firebase_service.create_employees([emp._firestore_data() for emp in employees])
+        except Exception:
+            return False
+        for emp, doc_id in zip(employees, doc_ids):
+            emp.id = doc_id
+        return True
+    
     def delete(self) -> bool:
         """Delete employee from Firebase"""
         if not self.id:
             return False
         firebase_service = get_firebase_service()
+        FirebaseEmployee.invalidate_cache()
+        _forget_user_data(('employee', self.id))
         return firebase_service.delete_employee(self.id)
     
     def to_dict(self) -> Dict[str, Any]:
@@ -136,6 +336,9 @@ class FirebaseEmployee(UserMixin):
 class FirebaseAdmin(UserMixin):
     """Firebase Admin model for Flask-Login"""
     
+    # Read by @admin_required and templates instead of isinstance checks
+    is_admin = True
+    
     def __init__(self, admin_data: Dict[str, Any]):
         self.id = admin_data.get('id')  # Firestore document ID
         self.username = admin_data.get('username')
@@ -162,10 +365,16 @@ class FirebaseAdmin(UserMixin):
         return None
     
     @staticmethod
-    def find_by_doc_id(doc_id: str) -> Optional['FirebaseAdmin']:
-        """Find admin by Firestore document ID"""
+    @request_cached
+    def find_by_doc_id(doc_id: str, cached: bool = False) -> Optional['FirebaseAdmin']:
+        """Find admin by Firestore document ID.
+        cached=True may return data up to USER_CACHE_TTL_SECONDS old (for the session user loader)."""
         firebase_service = get_firebase_service()
-        admin_data = firebase_service.get_admin_by_doc_id(doc_id)
+        if cached:
+            admin_data = _cached_user_data(('admin', doc_id),
+                                           lambda: firebase_service.get_admin_by_doc_id(doc_id))
+        else:
+            admin_data = firebase_service.get_admin_by_doc_id(doc_id)
         if admin_data:
             return FirebaseAdmin(admin_data)
         return None
@@ -179,8 +388,10 @@ class FirebaseAdmin(UserMixin):
             'name': self.name
         }
         
+        clear_request_cache()
         try:
             if self.id:
+                _forget_user_data(('admin', self.id))
                 # Update existing admin
                 return firebase_service.update_admin(self.id, admin_data)
             else:
@@ -194,6 +405,11 @@ class FirebaseAdmin(UserMixin):
 class FirebaseAttendance:
     """Firebase Attendance model"""
     
+    # Fields the attendance list views render. Passing these as `fields` makes
+    # Firestore send only them; records loaded that way are read-only (save()
+    # would reset the fields that were not fetched).
+    LIST_FIELDS = ['employee_id', 'date', 'sign_in_time', 'sign_out_time', 'total_hours', 'work_location']
+    
     def __init__(self, attendance_data: Dict[str, Any]):
         self.id = attendance_data.get('id')  # Firestore document ID
         self.employee_id = attendance_data.get('employee_id')
@@ -204,38 +420,77 @@ class FirebaseAttendance:
         self.work_location = attendance_data.get('work_location', 'office')  # 'office' or 'home'
         self.wfh_approved = attendance_data.get('wfh_approved', False)
         self.created_at = attendance_data.get('created_at')
+        # Parsed sign-in/out datetimes; templates and stats ask for them repeatedly
+        self._parsed_times = {}
+        # Sign-in/out state as last stored, for the daily_stats counters
+        self._saved_signed_in = bool(self.sign_in_time) if self.id else False
+        self._saved_signed_out = bool(self.sign_out_time) if self.id else False
+    
+    @staticmethod
+    def doc_id_for(employee_id: str, date: datetime) -> Optional[str]:
+        """Document id of an employee's record for a day (records created before
+        these ids existed have random ids; find them with find_by_employee_and_date).
+        employee_id is admin-entered, so it is percent-encoded to keep '/' out of the
+        path; None (use a random id) if the result is too long for Firestore."""
+        doc_id = f"{quote(str(employee_id), safe='')}_{_date_str(date)}"
+        return doc_id if len(doc_id.encode()) <= MAX_DOC_ID_BYTES else None
     
     @staticmethod
     def find_by_employee_and_date(employee_id: str, date: datetime) -> Optional['FirebaseAttendance']:
         """Find attendance record by employee and date"""
         firebase_service = get_firebase_service()
-        date_str = date.strftime('%Y-%m-%d')
+        date_str = _date_str(date)
         attendance_data = firebase_service.get_attendance_by_employee_and_date(employee_id, date_str)
         if attendance_data:
             return FirebaseAttendance(attendance_data)
         return None
     
     @staticmethod
-    def get_by_employee(employee_id: str, limit: int = 50) -> List['FirebaseAttendance']:
+    def get_by_employee(employee_id: str, limit: int = 50,
+                        fields: Optional[List[str]] = None) -> List['FirebaseAttendance']:
         """Get attendance records for an employee"""
         firebase_service = get_firebase_service()
-        attendance_data_list = firebase_service.get_attendance_by_employee(employee_id, limit)
+        attendance_data_list = firebase_service.get_attendance_by_employee(employee_id, limit, fields)
         return [FirebaseAttendance(data) for data in attendance_data_list]
     
     @staticmethod
-    def get_by_date(date: datetime) -> List['FirebaseAttendance']:
-        """Get all attendance records for a specific date"""
+    def get_by_date(date: datetime, status: Optional[str] = None,
+                    fields: Optional[List[str]] = None) -> List['FirebaseAttendance']:
+        """Get all attendance records for a specific date.
+        status: None, 'incomplete_sessions' or 'completed_sessions' (filtered in Firestore)"""
         firebase_service = get_firebase_service()
-        date_str = date.strftime('%Y-%m-%d')
-        attendance_data_list = firebase_service.get_attendance_by_date(date_str)
+        date_str = _date_str(date)
+        attendance_data_list = firebase_service.get_attendance_by_date(date_str, status, fields)
         return [FirebaseAttendance(data) for data in attendance_data_list]
     
     @staticmethod
-    def get_recent(limit: int = 100) -> List['FirebaseAttendance']:
-        """Get recent attendance records"""
+    def stream_recent(limit: int = 100, status: Optional[str] = None,
+                      fields: Optional[List[str]] = None) -> Iterator['FirebaseAttendance']:
+        """Yield recent attendance records one at a time as Firestore streams them"""
         firebase_service = get_firebase_service()
-        attendance_data_list = firebase_service.get_recent_attendance(limit)
-        return [FirebaseAttendance(data) for data in attendance_data_list]
+        for data in firebase_service.stream_recent_attendance(limit, status, fields):
+            yield FirebaseAttendance(data)
+    
+    @staticmethod
+    def get_recent(limit: int = 100, status: Optional[str] = None,
+                   fields: Optional[List[str]] = None) -> List['FirebaseAttendance']:
+        """Get recent attendance records, optionally filtered by session status"""
+        return list(FirebaseAttendance.stream_recent(limit, status, fields))
+    
+    @staticmethod
+    def get_page(date: Optional[datetime] = None, status: Optional[str] = None,
+                 fields: Optional[List[str]] = None, page_size: int = 50,
+                 cursor: Optional[str] = None) -> Tuple[List['FirebaseAttendance'], Optional[str]]:
+        """Get one page of attendance records (for `date`, or most recent first).
+        Returns (records, next_cursor); next_cursor is None on the last page."""
+        firebase_service = get_firebase_service()
+        if date:
+            attendance_data_list = firebase_service.get_attendance_by_date(
+                _date_str(date), status, fields, limit=page_size, cursor=cursor)
+        else:
+            attendance_data_list = list(firebase_service.stream_recent_attendance(
+                page_size, status, fields, cursor=cursor))
+        return [FirebaseAttendance(data) for data in attendance_data_list], _next_cursor(attendance_data_list, page_size)
     
     def save(self) -> bool:
         """Save attendance to Firebase"""
@@ -262,43 +517,79 @@ class FirebaseAttendance:
             'sign_out_time': sign_out_time_str,
             'total_hours': self.total_hours,
             'work_location': self.work_location,
-            'wfh_approved': self.wfh_approved
+            'wfh_approved': self.wfh_approved,
+            # Indexed flag so completed sessions can be filtered with an equality query
+            'is_complete': bool(sign_in_time_str and sign_out_time_str)
         }
         
+        daily_stats = self._daily_stats_change()
         try:
-            if self.id:
-                # Update existing attendance
-                return firebase_service.update_attendance(self.id, attendance_data)
-            else:
-                # Create new attendance
-                doc_id = firebase_service.create_attendance(attendance_data)
+            if not self.id:
+                # Create new attendance under the employee's id for the day, so a
+                # second create for the same day (e.g. a double-submitted sign-in) fails
+                doc_id = firebase_service.create_attendance(
+                    attendance_data, FirebaseAttendance.doc_id_for(self.employee_id, self.date), daily_stats)
+                if doc_id is None:
+                    return False
                 self.id = doc_id
-                return True
+            elif not firebase_service.update_attendance(self.id, attendance_data, daily_stats):
+                # Update existing attendance
+                return False
+            self._saved_signed_in = bool(self.sign_in_time)
+            self._saved_signed_out = bool(self.sign_out_time)
+            return True
         except Exception as e:
             print(f"❌ Error saving attendance: {e}")
             return False
     
-    def get_sign_in_datetime(self) -> Optional[datetime]:
-        """Get sign_in_time as datetime object"""
-        if isinstance(self.sign_in_time, datetime):
-            return self.sign_in_time
-        elif isinstance(self.sign_in_time, str):
+    def _daily_stats_change(self) -> Optional[tuple]:
+        """This save's change to daily_stats for the record's date, as
+        (date, employee_id, signed_in_delta, signed_out_delta, online), or None"""
+        signed_in, signed_out = bool(self.sign_in_time), bool(self.sign_out_time)
+        signed_in_delta = int(signed_in) - int(self._saved_signed_in)
+        signed_out_delta = int(signed_out) - int(self._saved_signed_out)
+        if not (signed_in_delta or signed_out_delta) or not isinstance(self.date, str):
+            return None
+        return self.date, self.employee_id, signed_in_delta, signed_out_delta, signed_in and not signed_out
+    
+    @staticmethod
+    def get_daily_stats(date: datetime) -> Dict[str, Any]:
+        """Get {'signed_in_count', 'signed_out_count', 'online_employee_ids'} for a date.
+        Reads the maintained daily_stats document; builds it from the records if missing."""
+        firebase_service = get_firebase_service()
+        date_str = _date_str(date)
+        stats = firebase_service.get_daily_stats(date_str) or firebase_service.ensure_daily_stats(date_str)
+        return stats or {'signed_in_count': 0, 'signed_out_count': 0, 'online_employee_ids': []}
+    
+    @staticmethod
+    def _parse_time(value) -> Optional[datetime]:
+        """Convert a stored sign-in/out value (datetime or ISO string) to datetime"""
+        if isinstance(value, datetime):
+            return value
+        elif isinstance(value, str):
             try:
-                return datetime.fromisoformat(self.sign_in_time.replace('Z', '+00:00'))
+                return datetime.fromisoformat(value.replace('Z', '+00:00'))
             except:
                 return None
         return None
     
+    def _cached_time(self, field: str) -> Optional[datetime]:
+        """Parse a time field once and reuse it until the raw value changes"""
+        raw = getattr(self, field)
+        cached = self._parsed_times.get(field)
+        if cached is not None and cached[0] is raw:
+            return cached[1]
+        parsed = self._parse_time(raw)
+        self._parsed_times[field] = (raw, parsed)
+        return parsed
+    
+    def get_sign_in_datetime(self) -> Optional[datetime]:
+        """Get sign_in_time as datetime object"""
+        return self._cached_time('sign_in_time')
+    
     def get_sign_out_datetime(self) -> Optional[datetime]:
         """Get sign_out_time as datetime object"""
-        if isinstance(self.sign_out_time, datetime):
-            return self.sign_out_time
-        elif isinstance(self.sign_out_time, str):
-            try:
-                return datetime.fromisoformat(self.sign_out_time.replace('Z', '+00:00'))
-            except:
-                return None
-        return None
+        return self._cached_time('sign_out_time')
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary"""
@@ -329,17 +620,29 @@ class FirebaseTimesheet:
         self.submitted_at = timesheet_data.get('submitted_at')
         self.created_at = timesheet_data.get('created_at')
         self.updated_at = timesheet_data.get('updated_at')
+        # FirebaseEmployee attached by admin list views for the name join; not stored
+        self.employee = None
     
     @staticmethod
     def find_by_employee_and_date(employee_id: str, date: datetime) -> Optional['FirebaseTimesheet']:
         """Find timesheet by employee and date"""
         firebase_service = get_firebase_service()
-        date_str = date.strftime('%Y-%m-%d')
+        date_str = _date_str(date)
         timesheet_data = firebase_service.get_timesheet_by_employee_and_date(employee_id, date_str)
         if timesheet_data:
             return FirebaseTimesheet(timesheet_data)
         return None
     
+    @staticmethod
+    def find_by_employee_and_dates(employee_id: str, dates: Iterable[datetime]) -> Dict[str, 'FirebaseTimesheet']:
+        """Find an employee's timesheets for several dates at once, keyed by YYYY-MM-DD"""
+        date_strs = [_date_str(d) for d in dates]
+        if not date_strs:
+            return {}
+        firebase_service = get_firebase_service()
+        timesheet_data_list = firebase_service.get_timesheets_by_employee_and_dates(employee_id, date_strs)
+        return {data.get('date'): FirebaseTimesheet(data) for data in timesheet_data_list}
+    
     @staticmethod
     def get_by_employee(employee_id: str, limit: int = 50) -> List['FirebaseTimesheet']:
         """Get timesheet records for an employee"""
@@ -347,21 +650,54 @@ class FirebaseTimesheet:
         timesheet_data_list = firebase_service.get_timesheets_by_employee(employee_id, limit)
         return [FirebaseTimesheet(data) for data in timesheet_data_list]
     
+    @staticmethod
+    def get_by_employee_before(employee_id: str, before_date: datetime, limit: int = 5) -> List['FirebaseTimesheet']:
+        """Get an employee's most recent timesheets from before before_date"""
+        firebase_service = get_firebase_service()
+        timesheet_data_list = firebase_service.get_timesheets_by_employee_before(
+            employee_id, _date_str(before_date), limit)
+        return [FirebaseTimesheet(data) for data in timesheet_data_list]
+    
     @staticmethod
     def get_by_date(date: datetime) -> List['FirebaseTimesheet']:
         """Get all timesheet records for a specific date"""
         firebase_service = get_firebase_service()
-        date_str = date.strftime('%Y-%m-%d')
+        date_str = _date_str(date)
         timesheet_data_list = firebase_service.get_timesheets_by_date(date_str)
         return [FirebaseTimesheet(data) for data in timesheet_data_list]
     
     @staticmethod
-    def get_recent(limit: int = 100) -> List['FirebaseTimesheet']:
-        """Get recent timesheet records"""
+    def get_recent(limit: int = 100, cursor: Optional[str] = None) -> List['FirebaseTimesheet']:
+        """Get recent timesheet records; cursor (see query()) continues from an earlier page"""
         firebase_service = get_firebase_service()
-        timesheet_data_list = firebase_service.get_recent_timesheets(limit)
+        timesheet_data_list = firebase_service.get_recent_timesheets(limit, cursor)
         return [FirebaseTimesheet(data) for data in timesheet_data_list]
     
+    @staticmethod
+    def latest_submission() -> Optional[Tuple[str, Any]]:
+        """(doc id, submitted_at) of the newest timesheet submission, as a change marker"""
+        latest = get_firebase_service().get_latest_timesheet_submission()
+        return (latest['id'], latest['submitted_at']) if latest else None
+    
+    @staticmethod
+    def query(employee_id: Optional[str] = None, date: Optional[datetime] = None,
+              limit: int = 50, cursor: Optional[str] = None) -> Tuple[List['FirebaseTimesheet'], Optional[str]]:
+        """Get one page of timesheets filtered by employee and/or date in a single Firestore query.
+        Returns (records, next_cursor); next_cursor is None on the last page."""
+        firebase_service = get_firebase_service()
+        date_str = _date_str(date) if date else None
+        timesheet_data_list = firebase_service.query_timesheets(employee_id, date_str, limit, cursor)
+        return [FirebaseTimesheet(data) for data in timesheet_data_list], _next_cursor(timesheet_data_list, limit)
+    
+    @staticmethod
+    def stream(employee_id: Optional[str] = None, date: Optional[datetime] = None,
+               limit: Optional[int] = None) -> Iterator['FirebaseTimesheet']:
+        """Yield timesheets filtered by employee and/or date one at a time as Firestore streams them"""
+        firebase_service = get_firebase_service()
+        date_str = _date_str(date) if date else None
+        for data in firebase_service.stream_timesheets(employee_id, date_str, limit):
+            yield FirebaseTimesheet(data)
+    
     def save(self) -> bool:
         """Save timesheet to Firebase"""
         firebase_service = get_firebase_service()
@@ -434,6 +770,13 @@ class FirebaseWFHApproval:
         except Exception:
             return False
 
+    @staticmethod
+    def get_by_employee(employee_id: str, limit: int = 100) -> List['FirebaseWFHApproval']:
+        """Get an employee's most recent WFH approvals, newest first"""
+        service = get_firebase_service()
+        approvals = service.get_wfh_approvals_by_employee(employee_id, limit=limit)
+        return [FirebaseWFHApproval(ap) for ap in approvals]
+
     @staticmethod
     def is_approved_for_date(employee_id: str, date_str: str) -> bool:
         service = get_firebase_service()
@@ -1,16 +1,102 @@
 import firebase_admin
 from firebase_admin import credentials, firestore, auth as firebase_auth
+from google.api_core.exceptions import AlreadyExists
 import os
+import logging
+import base64
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator
 import random
 import string
+import threading
+
+logger = logging.getLogger(__name__)
+
+class BatchWriter:
+    """Queue Firestore writes and send them as batched commits.
+
+    Use as a context manager: writes are committed FirebaseService.BATCH_LIMIT
+    at a time as they are queued, and the remainder on a clean exit. If the
+    block raises, the uncommitted remainder is dropped.
+    """
+    def __init__(self, service: 'FirebaseService'):
+        self._service = service
+        self._batch = service.batch()
+        self._pending = 0
+        self.committed = 0
+
+    def set(self, doc_ref, data: Dict[str, Any], merge: bool = False):
+        self._batch.set(doc_ref, data, merge=merge)
+        self._queued()
+
+    def update(self, doc_ref, data: Dict[str, Any]):
+        self._batch.update(doc_ref, data)
+        self._queued()
+
+    def delete(self, doc_ref):
+        self._batch.delete(doc_ref)
+        self._queued()
+
+    def _queued(self):
+        self._pending += 1
+        if self._pending == FirebaseService.BATCH_LIMIT:
+            self.commit()
+
+    def commit(self):
+        """Commit whatever is queued now"""
+        if self._pending:
+            self._batch.commit()
+            self.committed += self._pending
+            self._batch = self._service.batch()
+            self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
+
+def _count_daily_stats(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """daily_stats fields for one day's attendance records, in a single pass"""
+    signed_in_count = signed_out_count = 0
+    online_ids = set()
+    for record in records:
+        if record.get('sign_in_time'):
+            signed_in_count += 1
+            if not record.get('sign_out_time'):
+                online_ids.add(record.get('employee_id'))
+        if record.get('sign_out_time'):
+            signed_out_count += 1
+    return {
+        'signed_in_count': signed_in_count,
+        'signed_out_count': signed_out_count,
+        'online_employee_ids': sorted(online_ids),
+    }
+
+def _daily_stats_increments(employee_id: str, signed_in_delta: int, signed_out_delta: int,
+                            online: Optional[bool]) -> Dict[str, Any]:
+    """Server-side increments and array add/remove for a daily stats update (safe under
+    concurrent writes). online: True/False to add/remove employee_id, None to leave it."""
+    update = {
+        'signed_in_count': firestore.Increment(signed_in_delta),
+        'signed_out_count': firestore.Increment(signed_out_delta),
+        'updated_at': firestore.SERVER_TIMESTAMP
+    }
+    if online is True:
+        update['online_employee_ids'] = firestore.ArrayUnion([employee_id])
+    elif online is False:
+        update['online_employee_ids'] = firestore.ArrayRemove([employee_id])
+    return update
 
 class FirebaseService:
     """Firebase Firestore service for attendance system"""
     
     def __init__(self):
         self.db = None
+        # Dates whose daily_stats document is known to exist (see ensure_daily_stats)
+        self._daily_stats_dates = set()
         self.initialize_firebase()
     
     def initialize_firebase(self):
@@ -95,6 +181,53 @@ class FirebaseService:
             print(f"❌ Failed to connect to Firestore: {e}")
             print("⚠️ Firebase will not be available - app will use SQLite fallback")
             self.db = None
+            return
+        
+        self.warmup()
+    
+    def warmup(self):
+        """Issue a tiny read so the gRPC channel is open before the first user request"""
+        try:
+            self.db.collection('employees').limit(1).get()
+        except Exception as e:
+            print(f"⚠️ Firestore warmup read failed: {e}")
+    
+    # Firestore caps a single batched write at 500 operations
+    BATCH_LIMIT = 500
+    
+    def batch(self):
+        """Return a new Firestore WriteBatch for committing several writes in one RPC"""
+        if not self.db:
+            raise Exception("Firebase not available - use SQLite fallback")
+        return self.db.batch()
+    
+    def batch_writer(self) -> BatchWriter:
+        """Context manager that commits queued writes in as few RPCs as possible:
+        ``with service.batch_writer() as writer: writer.set(ref, data) ...``"""
+        return BatchWriter(self)
+    
+    # Pagination cursors are the url-safe base64 of the last document id on a page
+    @staticmethod
+    def encode_cursor(doc_id: str) -> str:
+        """Build an opaque page cursor pointing after doc_id"""
+        return base64.urlsafe_b64encode(doc_id.encode()).decode()
+    
+    def _start_after_cursor(self, query, collection: str, cursor: Optional[str]):
+        """Resume query after the document named by cursor; an invalid cursor restarts at page one"""
+        if not cursor:
+            return query
+        try:
+            doc_id = base64.urlsafe_b64decode(cursor.encode()).decode()
+        except ValueError:
+            return query
+        if not doc_id or '/' in doc_id:
+            return query
+        # Starting after the snapshot lets Firestore resume on every order_by
+        # field plus the implicit document-id tie-break
+        snapshot = self.db.collection(collection).document(doc_id).get()
+        if not snapshot.exists:
+            return query
+        return query.start_after(snapshot)
     
     # Employee CRUD Operations
     def create_employee(self, employee_data: Dict[str, Any]) -> str:
@@ -112,15 +245,37 @@ class FirebaseService:
             print(f"❌ Error creating employee: {e}")
             raise
     
+    def create_employees(self, employees_data: List[Dict[str, Any]]) -> List[str]:
+        """Create several employees using batched writes (one RPC per 500 employees)"""
+        if not self.db:
+            raise Exception("Firebase not available - use SQLite fallback")
+        try:
+            doc_ids = []
+            with self.batch_writer() as writer:
+                for employee_data in employees_data:
+                    doc_ref = self.db.collection('employees').document()
+                    employee_data['created_at'] = firestore.SERVER_TIMESTAMP
+                    employee_data['updated_at'] = firestore.SERVER_TIMESTAMP
+                    writer.set(doc_ref, employee_data)
+                    doc_ids.append(doc_ref.id)
+            logger.info("%d employees created", len(doc_ids))
+            return doc_ids
+        except Exception as e:
+            logger.warning("Error creating employees: %s", e)
+            raise
+    
     def get_employee_by_id(self, employee_id: str) -> Optional[Dict[str, Any]]:
         """Get employee by employee_id field"""
         try:
-            employees = self.db.collection('employees').where('employee_id', '==', employee_id).get()
-            for employee in employees:
-                employee_data = employee.to_dict()
-                employee_data['id'] = employee.id
-                return employee_data
-            return None
+            employee = next(self.db.collection('employees')
+                            .where('employee_id', '==', employee_id)
+                            .limit(1)
+                            .stream(), None)
+            if employee is None:
+                return None
+            employee_data = employee.to_dict()
+            employee_data['id'] = employee.id
+            return employee_data
         except Exception as e:
             print(f"❌ Error getting employee: {e}")
             return None
@@ -152,19 +307,68 @@ class FirebaseService:
             print(f"❌ Error getting all employees: {e}")
             return []
 
+    # Firestore accepts at most 30 values in a single 'in' filter
+    IN_QUERY_LIMIT = 30
+    
+    def get_employees_by_ids(self, employee_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get the employees whose employee_id is in employee_ids (one query per 30 ids)"""
+        try:
+            employee_ids = list(set(employee_ids))
+            employees_list = []
+            for start in range(0, len(employee_ids), self.IN_QUERY_LIMIT):
+                chunk = employee_ids[start:start + self.IN_QUERY_LIMIT]
+                for employee in self.db.collection('employees').where('employee_id', 'in', chunk).stream():
+                    employee_data = employee.to_dict()
+                    employee_data['id'] = employee.id
+                    employees_list.append(employee_data)
+            return employees_list
+        except Exception as e:
+            print(f"❌ Error getting employees by id: {e}")
+            return []
+    
     def get_employee_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get employee by email field"""
         try:
-            docs = self.db.collection('employees').where('email', '==', email).get()
-            for doc in docs:
-                data = doc.to_dict()
-                data['id'] = doc.id
-                return data
-            return None
+            doc = next(self.db.collection('employees').where('email', '==', email).limit(1).stream(), None)
+            if doc is None:
+                return None
+            data = doc.to_dict()
+            data['id'] = doc.id
+            return data
         except Exception as e:
             print(f"❌ Error getting employee by email: {e}")
             return None
     
+    def get_employee_doc_ids_by_email_lower(self, email_lower: str, limit: int = 2) -> List[str]:
+        """Document ids of employees whose lowercased email matches (single-field index on email_lower)"""
+        try:
+            docs = (self.db.collection('employees')
+                    .where('email_lower', '==', email_lower)
+                    .select(['email_lower'])
+                    .limit(limit)
+                    .stream())
+            return [doc.id for doc in docs]
+        except Exception as e:
+            print(f"❌ Error getting employee by email: {e}")
+            return []
+    
+    def backfill_employee_email_lower(self) -> int:
+        """One-off: set email_lower on employees written before the field existed.
+        Returns the number of employees updated."""
+        try:
+            docs = self.db.collection('employees').select(['email', 'email_lower']).stream()
+            with self.batch_writer() as writer:
+                for doc in docs:
+                    data = doc.to_dict()
+                    if 'email_lower' in data:
+                        continue
+                    writer.update(doc.reference, {'email_lower': (data.get('email') or '').lower()})
+            logger.info("Backfilled email_lower on %d employees", writer.committed)
+            return writer.committed
+        except Exception as e:
+            logger.warning("Error backfilling employee email_lower: %s", e)
+            return 0
+    
     def update_employee(self, doc_id: str, update_data: Dict[str, Any]) -> bool:
         """Update employee data"""
         try:
@@ -187,13 +391,31 @@ class FirebaseService:
             
             employee_id = employee.get('employee_id')
             
-            # Delete all attendance records for this employee
-            attendance_docs = self.db.collection('attendance').where('employee_id', '==', employee_id).get()
+            # Delete all attendance records for this employee, then the employee,
+            # in batched commits; only the fields daily_stats counts are fetched
+            attendance_docs = list(self.db.collection('attendance')
+                                   .where('employee_id', '==', employee_id)
+                                   .select(['date', 'sign_in_time', 'sign_out_time'])
+                                   .stream())
+            # Take the deleted records back out of the days' counters that exist
+            deltas = {}
             for doc in attendance_docs:
-                doc.reference.delete()
-            
-            # Delete the employee
-            self.db.collection('employees').document(doc_id).delete()
+                data = doc.to_dict()
+                if not data.get('date'):
+                    continue
+                signed_in, signed_out = deltas.get(data['date'], (0, 0))
+                deltas[data['date']] = (signed_in - bool(data.get('sign_in_time')),
+                                        signed_out - bool(data.get('sign_out_time')))
+            stats_refs = [self.db.collection('daily_stats').document(date_str) for date_str in deltas]
+            with self.batch_writer() as writer:
+                for doc in attendance_docs:
+                    writer.delete(doc.reference)
+                for snapshot in (self.db.get_all(stats_refs) if stats_refs else ()):
+                    if snapshot.exists:
+                        signed_in_delta, signed_out_delta = deltas[snapshot.id]
+                        writer.update(snapshot.reference, _daily_stats_increments(
+                            employee_id, signed_in_delta, signed_out_delta, online=False))
+                writer.delete(self.db.collection('employees').document(doc_id))
             print(f"✅ Employee {doc_id} and their attendance records deleted")
             return True
         except Exception as e:
@@ -217,12 +439,12 @@ class FirebaseService:
     def get_admin_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Get admin by username"""
         try:
-            admins = self.db.collection('admins').where('username', '==', username).get()
-            for admin in admins:
-                admin_data = admin.to_dict()
-                admin_data['id'] = admin.id
-                return admin_data
-            return None
+            admin = next(self.db.collection('admins').where('username', '==', username).limit(1).stream(), None)
+            if admin is None:
+                return None
+            admin_data = admin.to_dict()
+            admin_data['id'] = admin.id
+            return admin_data
         except Exception as e:
             print(f"❌ Error getting admin: {e}")
             return None
@@ -241,61 +463,76 @@ class FirebaseService:
             return None
     
     # Attendance CRUD Operations
-    def create_attendance(self, attendance_data: Dict[str, Any]) -> str:
-        """Create attendance record"""
+    def create_attendance(self, attendance_data: Dict[str, Any], doc_id: Optional[str] = None,
+                          daily_stats: Optional[tuple] = None) -> Optional[str]:
+        """Create attendance record. With doc_id the write only succeeds if that
+        document does not exist yet; returns None when it already does.
+        daily_stats: (date_str, employee_id, signed_in_delta, signed_out_delta, online)
+        counter changes committed atomically with the record."""
         try:
-            doc_ref = self.db.collection('attendance').document()
+            collection = self.db.collection('attendance')
             attendance_data['created_at'] = firestore.SERVER_TIMESTAMP
-            doc_ref.set(attendance_data)
+            doc_ref = collection.document(doc_id) if doc_id else collection.document()
+            batch = self.db.batch()
+            if doc_id:
+                batch.create(doc_ref, attendance_data)
+            else:
+                batch.set(doc_ref, attendance_data)
+            if daily_stats:
+                self._queue_daily_stats(batch, *daily_stats)
+            batch.commit()
             print(f"✅ Attendance record created with ID: {doc_ref.id}")
             return doc_ref.id
+        except AlreadyExists:
+            print(f"⚠️ Attendance record {doc_id} already exists")
+            return None
         except Exception as e:
             print(f"❌ Error creating attendance: {e}")
             raise
     
     def get_attendance_by_employee_and_date(self, employee_id: str, date_str: str) -> Optional[Dict[str, Any]]:
-        """Get attendance record for specific employee and date"""
+        """Get attendance record for specific employee and date
+        (at most one document, served by the employee_id/date composite index)"""
         try:
-            attendance_docs = (self.db.collection('attendance')
-                             .where('employee_id', '==', employee_id)
-                             .where('date', '==', date_str)
-                             .get())
-            
-            for doc in attendance_docs:
-                attendance_data = doc.to_dict()
-                attendance_data['id'] = doc.id
-                return attendance_data
-            return None
+            doc = next(self.db.collection('attendance')
+                       .where('employee_id', '==', employee_id)
+                       .where('date', '==', date_str)
+                       .limit(1)
+                       .stream(), None)
+            if doc is None:
+                return None
+            attendance_data = doc.to_dict()
+            attendance_data['id'] = doc.id
+            return attendance_data
         except Exception as e:
             print(f"❌ Error getting attendance: {e}")
             return None
     
-    def get_attendance_by_employee(self, employee_id: str, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get attendance records for an employee"""
+    def get_attendance_by_employee(self, employee_id: str, limit: int = 50,
+                                   fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get attendance records for an employee (only `fields` when given)"""
         try:
-            print(f"DEBUG: Querying attendance for employee_id: {employee_id}")
+            logger.debug("Querying attendance for employee_id: %s", employee_id)
             attendance_records = []
             
             # Try without ordering first to see if records exist
-            docs = (self.db.collection('attendance')
-                   .where('employee_id', '==', employee_id)
-                   .limit(limit)
-                   .get())
+            query = self.db.collection('attendance').where('employee_id', '==', employee_id)
+            if fields:
+                query = query.select(fields)
+            docs = query.limit(limit).get()
             
-            print(f"DEBUG: Found {len(docs)} documents (without ordering)")
+            logger.debug("Found %d documents (without ordering)", len(docs))
             
             for doc in docs:
                 attendance_data = doc.to_dict()
                 attendance_data['id'] = doc.id
                 attendance_records.append(attendance_data)
-                print(f"DEBUG: Document data: {attendance_data}")
             
             # Sort by date in Python if we have records
             if attendance_records:
                 attendance_records.sort(key=lambda x: x.get('date', ''), reverse=True)
-                print(f"DEBUG: Sorted records by date")
             
-            print(f"DEBUG: Returning {len(attendance_records)} attendance records")
+            logger.debug("Returning %d attendance records", len(attendance_records))
             return attendance_records
         except Exception as e:
             print(f"❌ Error getting employee attendance: {e}")
@@ -303,11 +540,32 @@ class FirebaseService:
             traceback.print_exc()
             return []
     
-    def get_attendance_by_date(self, date_str: str) -> List[Dict[str, Any]]:
-        """Get all attendance records for a specific date"""
+    @staticmethod
+    def _filter_session_status(query, status: Optional[str]):
+        """Push the admin session-status filter into the Firestore query"""
+        if status == 'incomplete_sessions':
+            # Signed in but not yet signed out
+            return query.where('sign_out_time', '==', None)
+        if status == 'completed_sessions':
+            # Equality on the flag written by FirebaseAttendance.save(); unlike
+            # sign_out_time != None it does not force the sort order
+            return query.where('is_complete', '==', True)
+        return query
+    
+    def get_attendance_by_date(self, date_str: str, status: Optional[str] = None,
+                               fields: Optional[List[str]] = None, limit: Optional[int] = None,
+                               cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get attendance records for a specific date, optionally filtered by session status.
+        With a limit, returns one page starting after `cursor`."""
         try:
             attendance_records = []
-            docs = self.db.collection('attendance').where('date', '==', date_str).get()
+            query = self.db.collection('attendance').where('date', '==', date_str)
+            if fields:
+                query = query.select(fields)
+            query = self._filter_session_status(query, status)
+            if limit:
+                query = self._start_after_cursor(query, 'attendance', cursor).limit(limit)
+            docs = query.get()
             
             for doc in docs:
                 attendance_data = doc.to_dict()
@@ -319,29 +577,112 @@ class FirebaseService:
             print(f"❌ Error getting attendance by date: {e}")
             return []
     
-    def get_recent_attendance(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get recent attendance records"""
+    def stream_recent_attendance(self, limit: int = 100, status: Optional[str] = None,
+                                 fields: Optional[List[str]] = None,
+                                 cursor: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield recent attendance records as Firestore streams them, optionally filtered by session status"""
         try:
-            attendance_records = []
-            docs = (self.db.collection('attendance')
-                   .order_by('date', direction=firestore.Query.DESCENDING)
-                   .limit(limit)
-                   .get())
+            query = self._filter_session_status(self.db.collection('attendance'), status)
+            if fields:
+                query = query.select(fields)
+            query = query.order_by('date', direction=firestore.Query.DESCENDING)
+            query = self._start_after_cursor(query, 'attendance', cursor)
             
-            for doc in docs:
+            for doc in query.limit(limit).stream():
                 attendance_data = doc.to_dict()
                 attendance_data['id'] = doc.id
-                attendance_records.append(attendance_data)
-            
-            return attendance_records
+                yield attendance_data
         except Exception as e:
             print(f"❌ Error getting recent attendance: {e}")
-            return []
     
-    def update_attendance(self, doc_id: str, update_data: Dict[str, Any]) -> bool:
-        """Update attendance record"""
+    def get_recent_attendance(self, limit: int = 100, status: Optional[str] = None,
+                              fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get recent attendance records, optionally filtered by session status"""
+        return list(self.stream_recent_attendance(limit, status, fields))
+    
+    def backfill_attendance_is_complete(self) -> int:
+        """One-off: set is_complete on attendance written before the flag existed.
+        Returns the number of records updated."""
+        try:
+            docs = (self.db.collection('attendance')
+                    .select(['sign_in_time', 'sign_out_time', 'is_complete'])
+                    .stream())
+            with self.batch_writer() as writer:
+                for doc in docs:
+                    data = doc.to_dict()
+                    if 'is_complete' in data:
+                        continue
+                    writer.update(doc.reference, {
+                        'is_complete': bool(data.get('sign_in_time') and data.get('sign_out_time'))
+                    })
+            updated = writer.committed
+            logger.info("Backfilled is_complete on %d attendance records", updated)
+            return updated
+        except Exception as e:
+            logger.warning("Error backfilling attendance is_complete: %s", e)
+            return 0
+    
+    # Per-day sign-in/out counters (daily_stats/{YYYY-MM-DD}), maintained on
+    # attendance writes so pages needing only the counts skip the day's records
+    def get_daily_stats(self, date_str: str) -> Optional[Dict[str, Any]]:
+        """Get the daily stats document, or None if it has not been built yet"""
         try:
-            self.db.collection('attendance').document(doc_id).update(update_data)
+            doc = self.db.collection('daily_stats').document(date_str).get()
+            if doc.exists:
+                return doc.to_dict()
+            return None
+        except Exception as e:
+            print(f"❌ Error getting daily stats: {e}")
+            return None
+    
+    def ensure_daily_stats(self, date_str: str) -> Optional[Dict[str, Any]]:
+        """Get the daily stats document, first building it from that day's attendance
+        records if it does not exist (e.g. a day from before it was maintained).
+        The check and the build run in one transaction, so attendance writes, which
+        call this before incrementing, never start the counters from zero."""
+        doc_ref = self.db.collection('daily_stats').document(date_str)
+        
+        @firestore.transactional
+        def seed(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if snapshot.exists:
+                return snapshot.to_dict()
+            records = (self.db.collection('attendance')
+                       .where('date', '==', date_str)
+                       .select(['employee_id', 'sign_in_time', 'sign_out_time'])
+                       .stream(transaction=transaction))
+            stats = _count_daily_stats(doc.to_dict() for doc in records)
+            transaction.create(doc_ref, dict(stats, date=date_str, updated_at=firestore.SERVER_TIMESTAMP))
+            return stats
+        
+        try:
+            stats = seed(self.db.transaction())
+        except Exception as e:
+            print(f"❌ Error building daily stats: {e}")
+            return None
+        if len(self._daily_stats_dates) >= 64:
+            self._daily_stats_dates.clear()
+        self._daily_stats_dates.add(date_str)
+        return stats
+    
+    def _queue_daily_stats(self, batch, date_str: str, employee_id: str, signed_in_delta: int,
+                           signed_out_delta: int, online: Optional[bool]):
+        """Queue server-side increments and array add/remove for the daily stats on
+        batch, building the document first if this process has not seen it yet."""
+        if date_str not in self._daily_stats_dates and self.ensure_daily_stats(date_str) is None:
+            raise RuntimeError(f"daily stats for {date_str} could not be built")
+        batch.update(self.db.collection('daily_stats').document(date_str),
+                     _daily_stats_increments(employee_id, signed_in_delta, signed_out_delta, online))
+    
+    def update_attendance(self, doc_id: str, update_data: Dict[str, Any],
+                          daily_stats: Optional[tuple] = None) -> bool:
+        """Update attendance record (and daily_stats atomically; see create_attendance)"""
+        try:
+            batch = self.db.batch()
+            batch.update(self.db.collection('attendance').document(doc_id), update_data)
+            if daily_stats:
+                self._queue_daily_stats(batch, *daily_stats)
+            batch.commit()
             print(f"✅ Attendance {doc_id} updated successfully")
             return True
         except Exception as e:
@@ -365,24 +706,44 @@ class FirebaseService:
     def get_timesheet_by_employee_and_date(self, employee_id: str, date_str: str) -> Optional[Dict[str, Any]]:
         """Get timesheet record for specific employee and date"""
         try:
-            timesheet_docs = (self.db.collection('timesheets')
-                            .where('employee_id', '==', employee_id)
-                            .where('date', '==', date_str)
-                            .get())
-            
-            for doc in timesheet_docs:
-                timesheet_data = doc.to_dict()
-                timesheet_data['id'] = doc.id
-                return timesheet_data
-            return None
+            doc = next(self.db.collection('timesheets')
+                       .where('employee_id', '==', employee_id)
+                       .where('date', '==', date_str)
+                       .limit(1)
+                       .stream(), None)
+            if doc is None:
+                return None
+            timesheet_data = doc.to_dict()
+            timesheet_data['id'] = doc.id
+            return timesheet_data
         except Exception as e:
             print(f"❌ Error getting timesheet: {e}")
             return None
     
+    def get_timesheets_by_employee_and_dates(self, employee_id: str, date_strs: List[str]) -> List[Dict[str, Any]]:
+        """Get an employee's timesheets for any of date_strs (one query per 30 dates)"""
+        try:
+            date_strs = list(set(date_strs))
+            timesheet_records = []
+            for start in range(0, len(date_strs), self.IN_QUERY_LIMIT):
+                chunk = date_strs[start:start + self.IN_QUERY_LIMIT]
+                docs = (self.db.collection('timesheets')
+                        .where('employee_id', '==', employee_id)
+                        .where('date', 'in', chunk)
+                        .stream())
+                for doc in docs:
+                    timesheet_data = doc.to_dict()
+                    timesheet_data['id'] = doc.id
+                    timesheet_records.append(timesheet_data)
+            return timesheet_records
+        except Exception as e:
+            print(f"❌ Error getting timesheets by dates: {e}")
+            return []
+    
     def get_timesheets_by_employee(self, employee_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Get timesheet records for an employee"""
         try:
-            print(f"DEBUG: Querying timesheets for employee_id: {employee_id}")
+            logger.debug("Querying timesheets for employee_id: %s", employee_id)
             timesheet_records = []
             
             docs = (self.db.collection('timesheets')
@@ -390,7 +751,7 @@ class FirebaseService:
                    .limit(limit)
                    .get())
             
-            print(f"DEBUG: Found {len(docs)} timesheet documents")
+            logger.debug("Found %d timesheet documents", len(docs))
             
             for doc in docs:
                 timesheet_data = doc.to_dict()
@@ -401,7 +762,7 @@ class FirebaseService:
             if timesheet_records:
                 timesheet_records.sort(key=lambda x: x.get('date', ''), reverse=True)
             
-            print(f"DEBUG: Returning {len(timesheet_records)} timesheet records")
+            logger.debug("Returning %d timesheet records", len(timesheet_records))
             return timesheet_records
         except Exception as e:
             print(f"❌ Error getting employee timesheets: {e}")
@@ -409,30 +770,49 @@ class FirebaseService:
             traceback.print_exc()
             return []
     
-    def get_timesheets_by_date(self, date_str: str) -> List[Dict[str, Any]]:
-        """Get all timesheet records for a specific date"""
+    def get_timesheets_by_employee_before(self, employee_id: str, before_date_str: str,
+                                          limit: int = 5) -> List[Dict[str, Any]]:
+        """Get an employee's latest timesheets dated before before_date_str, newest first
+        (composite index: employee_id ASC, date DESC)"""
         try:
-            timesheet_records = []
-            docs = self.db.collection('timesheets').where('date', '==', date_str).get()
+            docs = (self.db.collection('timesheets')
+                    .where('employee_id', '==', employee_id)
+                    .where('date', '<', before_date_str)
+                    .order_by('date', direction=firestore.Query.DESCENDING)
+                    .limit(limit)
+                    .stream())
             
+            timesheet_records = []
             for doc in docs:
                 timesheet_data = doc.to_dict()
                 timesheet_data['id'] = doc.id
                 timesheet_records.append(timesheet_data)
-            
             return timesheet_records
         except Exception as e:
-            print(f"❌ Error getting timesheets by date: {e}")
+            print(f"❌ Error getting earlier timesheets: {e}")
             return []
     
-    def get_recent_timesheets(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get recent timesheet records"""
+    def get_latest_timesheet_submission(self) -> Optional[Dict[str, Any]]:
+        """{'id', 'submitted_at'} of the most recently submitted timesheet, or None.
+        A cheap change marker: only that one field of one document is fetched."""
         try:
-            timesheet_records = []
             docs = (self.db.collection('timesheets')
-                   .order_by('date', direction=firestore.Query.DESCENDING)
-                   .limit(limit)
-                   .get())
+                    .order_by('submitted_at', direction=firestore.Query.DESCENDING)
+                    .select(['submitted_at'])
+                    .limit(1)
+                    .stream())
+            for doc in docs:
+                return {'id': doc.id, 'submitted_at': doc.to_dict().get('submitted_at')}
+            return None
+        except Exception as e:
+            print(f"❌ Error getting latest timesheet submission: {e}")
+            return None
+    
+    def get_timesheets_by_date(self, date_str: str) -> List[Dict[str, Any]]:
+        """Get all timesheet records for a specific date"""
+        try:
+            timesheet_records = []
+            docs = self.db.collection('timesheets').where('date', '==', date_str).get()
             
             for doc in docs:
                 timesheet_data = doc.to_dict()
@@ -441,9 +821,42 @@ class FirebaseService:
             
             return timesheet_records
         except Exception as e:
-            print(f"❌ Error getting recent timesheets: {e}")
+            print(f"❌ Error getting timesheets by date: {e}")
             return []
     
+    def get_recent_timesheets(self, limit: int = 100, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get recent timesheet records, newest first (ordered and limited by Firestore);
+        cursor resumes after a previous page"""
+        return list(self.stream_timesheets(limit=limit, cursor=cursor))
+    
+    def stream_timesheets(self, employee_id: Optional[str] = None, date_str: Optional[str] = None,
+                          limit: Optional[int] = 100, cursor: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield timesheets matching the given employee and/or date, newest first, as Firestore
+        streams them. Both filters run in Firestore (composite index: employee_id ASC, date DESC)."""
+        try:
+            query = self.db.collection('timesheets')
+            if employee_id:
+                query = query.where('employee_id', '==', employee_id)
+            if date_str:
+                query = query.where('date', '==', date_str)
+            else:
+                query = query.order_by('date', direction=firestore.Query.DESCENDING)
+            query = self._start_after_cursor(query, 'timesheets', cursor)
+            if limit:
+                query = query.limit(limit)
+            
+            for doc in query.stream():
+                timesheet_data = doc.to_dict()
+                timesheet_data['id'] = doc.id
+                yield timesheet_data
+        except Exception as e:
+            print(f"❌ Error querying timesheets: {e}")
+    
+    def query_timesheets(self, employee_id: Optional[str] = None, date_str: Optional[str] = None,
+                         limit: int = 100, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get one page of timesheets matching the given employee and/or date, newest first"""
+        return list(self.stream_timesheets(employee_id, date_str, limit, cursor))
+    
     def update_timesheet(self, doc_id: str, update_data: Dict[str, Any]) -> bool:
         """Update timesheet record"""
         try:
@@ -467,11 +880,14 @@ class FirebaseService:
             print(f"❌ Error creating WFH approval: {e}")
             raise
 
-    def get_wfh_approvals_by_employee(self, employee_id: str) -> List[Dict[str, Any]]:
+    def get_wfh_approvals_by_employee(self, employee_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return an employee's WFH approvals; with a limit, the newest `limit` by start_date"""
         try:
-            docs = (self.db.collection('wfh_approvals')
-                    .where('employee_id', '==', employee_id)
-                    .get())
+            query = self.db.collection('wfh_approvals').where('employee_id', '==', employee_id)
+            if limit:
+                # composite index: employee_id ASC, start_date DESC
+                query = query.order_by('start_date', direction=firestore.Query.DESCENDING).limit(limit)
+            docs = query.get()
             approvals = []
             for doc in docs:
                 data = doc.to_dict()
@@ -566,13 +982,17 @@ class FirebaseService:
 # -------------------- Payroll Collections --------------------
     # Payroll features removed
 
-# Global Firebase service instance
+# Global Firebase service instance - one Firestore client (and gRPC channel)
+# shared by every model and request thread in the process
 firebase_service = None
+_firebase_service_lock = threading.Lock()
 
 def get_firebase_service():
     """Get or create Firebase service instance"""
     global firebase_service
     if firebase_service is None:
-        firebase_service = FirebaseService()
+        with _firebase_service_lock:
+            if firebase_service is None:
+                firebase_service = FirebaseService()
     return firebase_service
 
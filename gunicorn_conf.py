@@ -0,0 +1,33 @@
+"""
+Gunicorn settings for production: gunicorn -c gunicorn_conf.py app:app
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Threads suit this app: request time is mostly spent waiting on Firestore,
+# SMTP and Firebase Auth, and those calls release the GIL while they wait. So
+# concurrency comes from many threads per worker rather than many processes,
+# each of which costs its own memory and Firestore gRPC channel.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+timeout = 60
+# Reuse client connections across requests (the platform proxy keeps them open)
+keepalive = 5
+
+
+def on_starting(server):
+    """Create the default admin (and sample data if enabled) once, before workers start.
+
+    Runs in a child process so the master never opens a Firestore gRPC channel,
+    which must not be shared across fork().
+    """
+    subprocess.run(
+        [sys.executable, '-c', 'from app import create_sample_data; create_sample_data()'],
+        check=False,
+    )